@@ -7,23 +7,33 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 
-@pytest.fixture(scope="function")
-def db_session():
+@pytest.fixture(scope="session")
+def db_template():
     """
-    Create an exact in-memory copy of the SQLite database for testing.
+    Read the test database from disk once per test session.
     """
     # Path to the original database
     test_db_path = Path(__file__).parent / "fixtures" / "db_2tables_test.db"
 
-    # Open connections to the original and in-memory databases
+    # Use SQLite's backup feature to copy the original database to memory
     original_connection = sqlite3.connect(test_db_path)
-    memory_connection = sqlite3.connect(":memory:")
+    template_connection = sqlite3.connect(":memory:")
+    original_connection.backup(template_connection)
+    original_connection.close()
 
-    # Use SQLite's backup feature to copy the original database to the in-memory database
-    original_connection.backup(memory_connection)
+    yield template_connection
 
-    # Close the connection to the original database
-    original_connection.close()
+    template_connection.close()
+
+
+@pytest.fixture(scope="function")
+def db_session(db_template):
+    """
+    Create an exact in-memory copy of the SQLite database for testing.
+    """
+    # Copy the in-memory template - no disk access per test
+    memory_connection = sqlite3.connect(":memory:")
+    db_template.backup(memory_connection)
 
     # Create an SQLAlchemy engine and session for the in-memory database
     memory_engine = create_engine(
@@ -1,9 +1,31 @@
 import os
+import subprocess
+import sys
 
+import numpy as np
 import pytest
 import yaml
+from skimage.measure import regionprops
 
-from track_gardener.db.config_functions import validateConfigFile
+import track_gardener
+import track_gardener.db.db_functions as fdb
+from track_gardener.db.config_functions import (
+    _load_config_cached,
+    create_calculate_signals_function,
+    load_config,
+    load_function_from_path,
+    validateConfigFile,
+)
+from track_gardener.db.config_functions import (
+    test_database_connection as check_database_connection,
+)
+from track_gardener.db.signal_kernels import (
+    KERNEL_FUNCTIONS,
+    _masked_channel_stats_loop,
+    _masked_channel_stats_numpy,
+    masked_channel_stats,
+    stats_kernel,
+)
 
 
 @pytest.fixture
@@ -102,7 +124,30 @@ def relative_db_path():
                 "graphs": [{"signals": ["area"]}],
             },
             False,
-            "Measurement names are not unique.",
+            "Measurement names are not unique: area.",
+        ),
+        # Test missing custom function file
+        (
+            lambda db_path: {
+                "database": {"path": db_path},
+                "signal_channels": [{"path": "signal.zarr"}],
+                "cell_measurements": [
+                    {"function": "area", "source": "regionprops"},
+                    {
+                        "function": "f",
+                        "source": "missing_script.py",
+                        "channels": ["ch0"],
+                    },
+                    {
+                        "function": "g",
+                        "source": "missing_script.py",
+                        "channels": ["ch0"],
+                    },
+                ],
+                "graphs": [{"signals": ["area"]}],
+            },
+            False,
+            "File 'missing_script.py' does not exist.",
         ),
     ],
 )
@@ -123,3 +168,481 @@ def test_validate_config_file(
 
     # Clean up
     os.remove("test_config.yaml")
+
+
+def test_signal_kernel_matches_regionprops():
+    """
+    Test that the intensity statistics computed by the signal kernel
+    match regionprops.
+    """
+    rng = np.random.default_rng(0)
+    label_img = np.zeros((40, 40), dtype=int)
+    label_img[5:20, 8:30] = 1
+    label_img[12:18, 20:25] = 0
+    cell = regionprops(label_img)[0]
+
+    ch_data_list = [
+        rng.integers(0, 4095, size=(2, 40, 40)).astype(np.uint16),
+        rng.integers(0, 255, size=(2, 40, 40)).astype(np.uint16),
+    ]
+
+    functions = ["intensity_mean", "intensity_min", "intensity_max"]
+    functions.append("intensity_std")
+    config = {
+        "signal_channels": [{"name": "ch0"}, {"name": "ch1"}],
+        "cell_measurements": [
+            {
+                "function": f,
+                "source": "regionprops",
+                "channels": ["ch0", "ch1"],
+                "name": f,
+            }
+            for f in functions
+        ],
+    }
+
+    calculate_cell_signals = create_calculate_signals_function(config)
+    cell_dict = calculate_cell_signals(cell, 1, ch_data_list)
+
+    for ind, ch in enumerate(ch_data_list):
+        expected = regionprops(label_img, intensity_image=ch[1])[0]
+        for f in functions:
+            assert cell_dict[f"ch{ind}_{f}"] == pytest.approx(
+                float(expected[f]), rel=1e-5
+            )
+
+    # the pure python loop and the numpy fallback agree
+    signal_cube = rng.random((15, 22, 3))
+    np.testing.assert_allclose(
+        _masked_channel_stats_loop(signal_cube, cell.image),
+        _masked_channel_stats_numpy(signal_cube, cell.image),
+    )
+
+
+def test_signal_kernel_paths():
+    """
+    Test that the numpy path and the compiled kernel give the same
+    statistics, with min and max in the image dtype and a stable std
+    for a large offset.
+    """
+    rng = np.random.default_rng(5)
+    mask = np.zeros((30, 30), dtype=bool)
+    mask[5:25, 3:20] = True
+
+    # large offset - one-pass variance loses the small spread here
+    signal_cube = (60000 + rng.integers(0, 5, size=(30, 30, 2))).astype(
+        np.uint16
+    )
+    expected = signal_cube[mask].astype(np.float64)
+
+    result = masked_channel_stats(signal_cube, mask, KERNEL_FUNCTIONS)
+    assert (
+        result["intensity_min"].dtype == np.uint16
+    ), f"Min dtype {result['intensity_min'].dtype} is not the image dtype."
+    assert (
+        result["intensity_max"].dtype == np.uint16
+    ), f"Max dtype {result['intensity_max'].dtype} is not the image dtype."
+    np.testing.assert_allclose(result["intensity_std"], expected.std(axis=0))
+
+    float_cube = 1e8 + rng.random((30, 30, 2))
+    np.testing.assert_allclose(
+        _masked_channel_stats_loop(float_cube, mask),
+        _masked_channel_stats_numpy(float_cube, mask),
+    )
+
+    pytest.importorskip("numba")
+    kernel = stats_kernel(KERNEL_FUNCTIONS)
+    assert kernel is not None, "Kernel is not compiled with numba installed."
+    np.testing.assert_allclose(
+        kernel(float_cube, mask),
+        _masked_channel_stats_numpy(float_cube, mask),
+    )
+
+
+def test_ring_measurements_fused():
+    """
+    Test that ring measurements calculated together match
+    separate ring_intensity calls.
+    """
+    rng = np.random.default_rng(4)
+    label_img = np.zeros((40, 40), dtype=int)
+    label_img[12:25, 10:22] = 1
+    cell = regionprops(label_img)[0]
+
+    ch_data_list = [
+        rng.integers(0, 4095, size=(2, 40, 40)).astype(np.uint16),
+        rng.integers(0, 255, size=(2, 40, 40)).astype(np.uint16),
+    ]
+
+    measurements = [
+        {
+            "function": "ring_intensity",
+            "source": "track_gardener",
+            "channels": ["ch0", "ch1"],
+            "name": f"ring_{shape}_{stat}",
+            "ring_width": 4,
+            "ring_shape": shape,
+            "statistics": stat,
+        }
+        for shape in ["disk", "bbox"]
+        for stat in ["mean", "sum", "median"]
+    ]
+    config = {
+        "signal_channels": [{"name": "ch0"}, {"name": "ch1"}],
+        "cell_measurements": measurements,
+    }
+
+    calculate_cell_signals = create_calculate_signals_function(config)
+    cell_dict = calculate_cell_signals(cell, 1, ch_data_list)
+
+    for m in measurements:
+        expected = fdb.ring_intensity(cell, 1, ch_data_list, kwargs=m)
+        for ind, ch in enumerate(m["channels"]):
+            assert cell_dict[f"{ch}_{m['name']}"] == pytest.approx(
+                expected[ind]
+            ), f"Fused {m['name']} differs for {ch}."
+
+
+def test_signal_kernel_variants_across_sessions(tmp_path):
+    """
+    Test that kernels for different statistics keep working when
+    they are built again in new sessions.
+    """
+    pytest.importorskip("numba")
+    src_path = os.path.dirname(os.path.dirname(track_gardener.__file__))
+    code = (
+        "import sys\n"
+        "import numpy as np\n"
+        "from track_gardener.db.signal_kernels import stats_kernel\n"
+        "cube = np.ones((3, 3, 1))\n"
+        "mask = np.ones((3, 3), dtype=bool)\n"
+        "for f in sys.argv[1:]:\n"
+        "    print(stats_kernel(tuple(f.split(',')))(cube, mask)[0, 0])\n"
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": src_path,
+        "NUMBA_CACHE_DIR": str(tmp_path),
+    }
+    full = ",".join(KERNEL_FUNCTIONS)
+    for variants in [
+        [full],
+        [full, "intensity_mean"],
+        [full, "intensity_mean"],
+    ]:
+        result = subprocess.run(
+            [sys.executable, "-c", code, *variants],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["1.0"] * len(variants), result.stdout
+
+
+def test_signal_kernel_without_numba(monkeypatch):
+    """
+    Test that the numpy path is used when numba cannot be imported.
+    """
+    monkeypatch.setitem(sys.modules, "numba", None)
+    stats_kernel.cache_clear()
+
+    rng = np.random.default_rng(7)
+    signal_cube = rng.random((10, 12, 2))
+    mask = rng.random((10, 12)) > 0.5
+
+    try:
+        assert stats_kernel(KERNEL_FUNCTIONS) is None, "Expected no kernel."
+        result = masked_channel_stats(signal_cube, mask)
+    finally:
+        stats_kernel.cache_clear()
+
+    expected = _masked_channel_stats_numpy(signal_cube, mask)
+    for ind, f in enumerate(KERNEL_FUNCTIONS):
+        np.testing.assert_allclose(result[f], expected[ind])
+
+
+def test_calculate_signals_single_frame():
+    """
+    Test that signals of loaded 2D frames match the signals
+    of the same frame of the full stack.
+    """
+    rng = np.random.default_rng(6)
+    label_img = np.zeros((40, 40), dtype=int)
+    label_img[12:25, 10:22] = 1
+    cell = regionprops(label_img)[0]
+
+    ch_data_list = [
+        rng.integers(0, 4095, size=(3, 40, 40)).astype(np.uint16),
+        rng.integers(0, 255, size=(3, 40, 40)).astype(np.uint16),
+    ]
+    config = {
+        "signal_channels": [{"name": "ch0"}, {"name": "ch1"}],
+        "cell_measurements": [
+            {
+                "function": "intensity_mean",
+                "source": "regionprops",
+                "channels": ["ch0", "ch1"],
+                "name": "mean",
+            },
+            {
+                "function": "ring_intensity",
+                "source": "track_gardener",
+                "channels": ["ch0", "ch1"],
+                "name": "ring",
+                "ring_width": 4,
+            },
+        ],
+    }
+
+    calculate_cell_signals = create_calculate_signals_function(config)
+    expected = calculate_cell_signals(cell, 2, ch_data_list)
+    result = calculate_cell_signals(cell, 2, [ch[2] for ch in ch_data_list])
+
+    assert result == expected, f"Expected {expected}, got {result}"
+
+
+def test_calculate_signals_window(tmp_path):
+    """
+    Test that signals calculated with a window read in advance match
+    the signals read from the channel data, while custom functions
+    still get the (t,row,col) channel data.
+    """
+    script = tmp_path / "custom_signals.py"
+    script.write_text(
+        "def custom_sum(cell, t, ch_data_list, kwargs):\n"
+        "    return [\n"
+        "        float(ch[t][cell.slice][cell.image].sum())\n"
+        "        for ch in ch_data_list\n"
+        "    ]\n"
+    )
+
+    rng = np.random.default_rng(8)
+    label_img = np.zeros((40, 40), dtype=int)
+    label_img[12:25, 10:22] = 1
+    cell = regionprops(label_img)[0]
+
+    ch_data_list = [
+        rng.integers(0, 4095, size=(3, 40, 40)).astype(np.uint16),
+        rng.integers(0, 255, size=(3, 40, 40)).astype(np.uint16),
+    ]
+    config = {
+        "signal_channels": [{"name": "ch0"}, {"name": "ch1"}],
+        "cell_measurements": [
+            {
+                "function": "intensity_mean",
+                "source": "regionprops",
+                "channels": ["ch0", "ch1"],
+                "name": "mean",
+            },
+            {
+                "function": "ring_intensity",
+                "source": "track_gardener",
+                "channels": ["ch0", "ch1"],
+                "name": "ring",
+                "ring_width": 4,
+            },
+            {
+                "function": "custom_sum",
+                "source": str(script),
+                "channels": ["ch0", "ch1"],
+                "name": "sum",
+            },
+        ],
+    }
+
+    calculate_cell_signals = create_calculate_signals_function(config)
+    padding = calculate_cell_signals.window_padding
+    assert padding == 4, f"Expected padding of the ring width, got {padding}"
+
+    expected = calculate_cell_signals(cell, 2, ch_data_list)
+
+    # window covering the cell with its ring
+    region = (12 - padding, 10 - padding, 25 + padding, 22 + padding)
+    window = fdb.read_signal_window(ch_data_list, 2, region)
+    result = calculate_cell_signals(cell, 2, ch_data_list, window=window)
+    assert result == expected, f"Expected {expected}, got {result}"
+
+    # the built-in measurements use the window, custom functions do not
+    frames, offset = window
+    zeros = ([np.zeros_like(frame) for frame in frames], offset)
+    result = calculate_cell_signals(cell, 2, ch_data_list, window=zeros)
+    assert result["ch0_mean"] == 0 and result["ch0_ring"] == 0, result
+    assert result["ch0_sum"] == expected["ch0_sum"], result
+
+    # window too small - the signal is read from the channel data
+    window = fdb.read_signal_window(ch_data_list, 2, (14, 14, 20, 20))
+    result = calculate_cell_signals(cell, 2, ch_data_list, window=window)
+    assert result == expected, f"Expected {expected}, got {result}"
+
+
+def test_signal_kernel_specialization():
+    """
+    Test that kernels specialised for a set of statistics are reused
+    and give the same values as the full kernel.
+    """
+    rng = np.random.default_rng(5)
+    signal_cube = rng.random((12, 9, 2))
+    mask = rng.random((12, 9)) > 0.3
+
+    stats_kernel.cache_clear()
+    full = masked_channel_stats(signal_cube, mask)
+    mean_only = masked_channel_stats(signal_cube, mask, ("intensity_mean",))
+    mean_again = masked_channel_stats(signal_cube, mask, ("intensity_mean",))
+
+    assert list(mean_only) == ["intensity_mean"]
+    np.testing.assert_allclose(
+        mean_only["intensity_mean"], full["intensity_mean"]
+    )
+    np.testing.assert_allclose(
+        mean_again["intensity_mean"], full["intensity_mean"]
+    )
+    assert stats_kernel.cache_info().hits == 1
+    assert stats_kernel.cache_info().misses == 2
+
+
+def test_load_config_cached(tmp_path):
+    """
+    Test that an unchanged config file is parsed once
+    and an edited one is read again.
+    """
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("database:\n  path: first.db\n")
+
+    _load_config_cached.cache_clear()
+    first = load_config(config_path)
+    first["database"]["path"] = "modified in place"
+    second = load_config(config_path)
+
+    assert second == {"database": {"path": "first.db"}}
+    assert _load_config_cached.cache_info().hits == 1
+
+    config_path.write_text("database:\n  path: second_file.db\n")
+
+    assert load_config(config_path) == {"database": {"path": "second_file.db"}}
+
+
+def test_custom_function_loading(tmp_path):
+    """
+    Test that custom functions are loaded once per file version
+    and used for signal calculation.
+    """
+    script = tmp_path / "custom_signals.py"
+    script.write_text(
+        "def custom_sum(cell, t, ch_data_list, kwargs):\n"
+        "    return [\n"
+        "        float(ch[t][cell.slice][cell.image].sum())\n"
+        "        for ch in ch_data_list\n"
+        "    ]\n"
+    )
+
+    status, f = load_function_from_path(str(script), "custom_sum")
+    assert status, f
+    assert load_function_from_path(str(script), "custom_sum")[1] is f
+
+    label_img = np.zeros((10, 10), dtype=int)
+    label_img[2:5, 3:7] = 1
+    cell = regionprops(label_img)[0]
+    ch_data_list = [np.ones((1, 10, 10))]
+
+    config = {
+        "signal_channels": [{"name": "ch0"}],
+        "cell_measurements": [
+            {
+                "function": "custom_sum",
+                "source": str(script),
+                "channels": ["ch0"],
+                "name": "sum",
+            }
+        ],
+    }
+    calculate_cell_signals = create_calculate_signals_function(config)
+
+    assert calculate_cell_signals(cell, 0, ch_data_list) == {"ch0_sum": 12.0}
+
+    # an edited file is loaded again
+    script.write_text(
+        "def custom_sum(cell, t, ch_data_list, kwargs):\n"
+        "    return [-1.0]\n"
+    )
+    os.utime(script, ns=(0, 0))
+
+    status, f_edited = load_function_from_path(str(script), "custom_sum")
+    assert f_edited is not f
+    assert f_edited(cell, 0, ch_data_list, {}) == [-1.0]
+
+
+def test_custom_script_executed_once(tmp_path):
+    """
+    Test that a script providing several functions is executed once
+    and that an edit within the same modification time is picked up.
+    """
+    log = tmp_path / "executed.txt"
+    script = tmp_path / "custom_many.py"
+    script.write_text(
+        f"with open({str(log)!r}, 'a') as f:\n"
+        "    f.write('x')\n"
+        "def first(cell, t, ch_data_list, kwargs):\n"
+        "    return [1.0]\n"
+        "def second(cell, t, ch_data_list, kwargs):\n"
+        "    return [2.0]\n"
+    )
+    os.utime(script, ns=(0, 0))
+
+    assert load_function_from_path(str(script), "first")[0]
+    assert load_function_from_path(str(script), "second")[0]
+    assert log.read_text() == "x", "Expected the script to run once."
+
+    status, msg = load_function_from_path(str(script), "third")
+    assert not status, "Expected a missing function to fail."
+
+    # edited within the same modification time - the size differs
+    script.write_text(
+        "def first(cell, t, ch_data_list, kwargs):\n"
+        "    # edited\n"
+        "    return [-1.0]\n"
+    )
+    os.utime(script, ns=(0, 0))
+
+    status, f = load_function_from_path(str(script), "first")
+    assert f(None, 0, [], {}) == [-1.0], "Expected the edited function."
+
+
+def test_database_probe(relative_db_path, tmp_path):
+    """
+    Test the read-only probe of the database file.
+    """
+    status, _ = check_database_connection(relative_db_path)
+    assert status, "Expected the test database to open."
+
+    status, msg = check_database_connection(tmp_path / "missing.db")
+    assert not status, "Expected a missing database to fail."
+    assert msg.startswith("Database connection failed")
+
+    not_a_db = tmp_path / "not_a.db"
+    not_a_db.write_text("this is not a database" * 10)
+    status, _ = check_database_connection(not_a_db)
+    assert not status, "Expected a non database file to fail."
+
+
+def test_config_functions_import_without_skimage():
+    """
+    Test that scikit-image and numba are not imported together with
+    the config and database functions - they are loaded only when needed.
+    """
+    src_path = os.path.dirname(os.path.dirname(track_gardener.__file__))
+    code = (
+        "import sys\n"
+        "import track_gardener.db.config_functions\n"
+        "print(any(m.startswith(('skimage', 'numba')) for m in sys.modules))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": src_path}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "False", result.stdout
@@ -1,11 +1,15 @@
 from unittest.mock import MagicMock
 
+import dask.array as da
 import numpy as np
 import pytest
+from skimage.measure import regionprops
+from sqlalchemy import event
 from sqlalchemy.orm import Session, make_transient
 
 import track_gardener.db.db_functions as fdb
 from track_gardener.db.db_functions import (
+    add_new_CellDB,
     add_new_core_CellDB,
     cellsDB_after_trackDB,
     cut_trackDB,
@@ -17,6 +21,7 @@ from track_gardener.db.db_functions import (
     trackDB_after_cellDB,
 )
 from track_gardener.db.db_model import NO_PARENT, CellDB, TrackDB
+from track_gardener.db.frame_table import build_frame_table
 
 
 @pytest.fixture
@@ -1270,6 +1275,55 @@ def test_remove_cell_cut_track(extended_db_session):
     assert t.t_begin == current_frame
 
 
+def test_add_new_CellDB_single_commit(extended_db_session):
+    """
+    Test that adding a cell of a new track is stored with a single commit.
+    """
+    new_id = 50000
+    current_frame = 5
+
+    cell = MagicMock()
+    cell.label = new_id
+    cell.centroid = (1, 1)
+    cell.bbox = (0, 0, 2, 2)
+    cell.image = np.ones((2, 2), dtype=bool)
+
+    commits = []
+
+    def listener(session):
+        commits.append(session)
+
+    event.listen(extended_db_session, "after_commit", listener)
+    try:
+        add_new_CellDB(
+            extended_db_session,
+            current_frame,
+            cell,
+            signal_function=lambda cell, t, ch_list: {"area": 4},
+        )
+    finally:
+        event.remove(extended_db_session, "after_commit", listener)
+
+    assert len(commits) == 1, f"Expected a single commit, got {len(commits)}"
+
+    c = (
+        extended_db_session.query(CellDB)
+        .filter_by(track_id=new_id, t=current_frame)
+        .one()
+    )
+    assert c.signals == {
+        "area": 4
+    }, f"Expected stored signals, got {c.signals}"
+    assert c.tags == {"modified": True}, f"Expected modified tag, got {c.tags}"
+
+    t = extended_db_session.query(TrackDB).filter_by(track_id=new_id).one()
+    assert (t.t_begin, t.t_end, t.root) == (
+        current_frame,
+        current_frame,
+        new_id,
+    ), f"Expected a new single frame track, got {t}"
+
+
 def test_add_note_no_track(extended_db_session):
     """
     Test adding a note to a non-existing track.
@@ -1348,3 +1402,144 @@ def test_add_tags(extended_db_session):
     )
 
     assert cell_list.tags["apoptosis"], f"Expected True, got {cell_list.tags}"
+
+
+@pytest.fixture
+def ring_cell_data():
+    """
+    A single square cell with a signal image (t,row,col).
+    """
+    label_img = np.zeros((60, 60), dtype=int)
+    label_img[20:30, 20:30] = 1
+    cell = regionprops(label_img)[0]
+
+    signal = np.arange(60 * 60, dtype=np.float32).reshape(1, 60, 60)
+
+    return cell, signal
+
+
+def test_ring_intensity_mean(ring_cell_data):
+    """
+    Test the default (dilated disk) ring mean.
+    """
+    cell, _ = ring_cell_data
+
+    # background 10 and the cell 1000 - the ring sees only the background
+    signal = np.full((1, 60, 60), 10.0, dtype=np.float32)
+    signal[0, 20:30, 20:30] = 1000
+
+    result = fdb.ring_intensity(cell, 0, [signal], kwargs={"ring_width": 3})
+
+    assert result == [pytest.approx(10.0)]
+
+
+def test_ring_intensity_sum_fast(ring_cell_data):
+    """
+    Test the bbox ring computed from the padded box and cell integrals.
+    """
+    cell, signal = ring_cell_data
+    ring_width = 4
+
+    outer = signal[0, 16:34, 16:34]
+    cell_sum = signal[0, 20:30, 20:30].sum(dtype=np.float64)
+    expected_sum = outer.sum(dtype=np.float64) - cell_sum
+    expected_count = outer.size - cell.area
+
+    kwargs = {"ring_width": ring_width, "ring_shape": "bbox"}
+
+    result_sum = fdb.ring_intensity(
+        cell,
+        0,
+        [signal, da.from_array(signal)],
+        kwargs={**kwargs, "statistics": "sum"},
+    )
+    assert result_sum == [pytest.approx(expected_sum)] * 2
+
+    result_mean = fdb.ring_intensity(
+        cell, 0, [signal], kwargs={**kwargs, "statistics": "mean"}
+    )
+    assert result_mean == [pytest.approx(expected_sum / expected_count)]
+
+    # the median goes through the explicit ring mask
+    ring_mask = np.ones(outer.shape, dtype=bool)
+    ring_mask[4:14, 4:14] = False
+    result_median = fdb.ring_intensity(
+        cell, 0, [signal], kwargs={**kwargs, "statistics": "median"}
+    )
+    assert result_median == [pytest.approx(np.median(outer[ring_mask]))]
+
+
+def test_build_frame_table():
+    """
+    Test that the frame table matches regionprops.
+    """
+    label_img = np.zeros((50, 50), dtype=int)
+    label_img[5:10, 5:20] = 3
+    label_img[30:45, 12:14] = 7
+    label_img[40:42, 40:50] = 8
+
+    frame_table = build_frame_table(label_img)
+    expected = regionprops(label_img)
+
+    assert len(frame_table) == len(expected)
+    for row, cell in enumerate(expected):
+        assert frame_table.label_ids[row] == cell.label
+        assert frame_table.bbox(row) == cell.bbox
+        mask = frame_table.mask(label_img, row)
+        np.testing.assert_array_equal(mask, cell.image)
+        assert frame_table.centroid(mask, row) == pytest.approx(cell.centroid)
+
+
+def test_partition_median():
+    """
+    Test that the partition based median matches np.median.
+    """
+    rng = np.random.default_rng(3)
+
+    for size in [1, 2, 7, 10, 101]:
+        values = rng.integers(0, 1000, size=size).astype(np.uint16)
+        assert fdb._partition_median(values) == pytest.approx(
+            np.median(values)
+        ), f"Median of {size} values differs from np.median."
+
+
+def test_ring_intensity_sum_integer(ring_cell_data):
+    """
+    Test that ring sums of integer images are exact.
+    """
+    cell, signal = ring_cell_data
+    signal_int = (signal * 1000).astype(np.uint32)
+
+    outer = signal_int[0, 17:33, 17:33].astype(np.int64)
+    expected = outer.sum() - outer[3:13, 3:13].sum()
+
+    result = fdb.ring_intensity(
+        cell,
+        0,
+        [signal_int],
+        kwargs={"ring_width": 3, "ring_shape": "bbox", "statistics": "sum"},
+    )
+
+    assert result == [float(expected)], f"Expected {expected}, got {result}"
+
+
+def test_ring_statistics_single_frame(ring_cell_data):
+    """
+    Test that ring statistics of a loaded 2D frame match
+    the statistics of the same frame of the full stack.
+    """
+    cell, signal = ring_cell_data
+    stack = np.concatenate([signal * 2, signal + 1])
+
+    for shape in ["disk", "bbox"]:
+        kwargs = {
+            "ring_width": 3,
+            "ring_shape": shape,
+            "statistics": ["mean", "sum", "median"],
+        }
+        expected = fdb.ring_statistics(cell, 1, [stack], **kwargs)
+        result = fdb.ring_statistics(cell, 1, [stack[1]], **kwargs)
+
+        assert (
+            result == expected
+        ), f"{shape}: expected {expected}, got {result}"
@@ -1,11 +1,14 @@
 from unittest.mock import Mock
 
+import networkx as nx
 from qtpy.QtCore import QPointF, Qt
 
 from track_gardener.db.db_model import TrackDB
 from track_gardener.graph.family_graph import (
     FamilyGraphWidget,
     build_Newick_tree,
+    reingold_tilford,
+    tree_arrays,
 )
 
 
@@ -32,6 +35,43 @@ def test_basic_family_graph(db_session):
     ), "Expected to get a tree containing node 37401 with y-coordinate 0.5"
 
 
+def test_reingold_tilford_deep_lineage():
+    """
+    Test layout of a lineage deeper than the recursion limit.
+    """
+    depth = 5000
+    G = nx.path_graph(depth, create_using=nx.DiGraph)
+    G.add_edge(depth - 1, depth)
+    G.add_edge(depth - 1, depth + 1)
+
+    pos = reingold_tilford(G)
+
+    assert len(pos) == depth + 2, f"Expected all nodes, got {len(pos)}"
+    assert pos[depth] == (0, -depth), f"Unexpected position {pos[depth]}"
+    assert pos[depth + 1] == (1, -depth), f"Unexpected {pos[depth + 1]}"
+    assert pos[0] == (depth / 2, 0), f"Unexpected root position {pos[0]}"
+
+
+def test_tree_arrays(db_session):
+    """
+    Test that node attributes are collected in node order.
+    """
+
+    t = build_Newick_tree(db_session, 37401)
+    track_ids, start, stop, y = tree_arrays(t)
+
+    assert track_ids.tolist() == list(
+        t.nodes
+    ), f"Expected track ids in node order, got {track_ids.tolist()}"
+
+    ind = track_ids.tolist().index(37401)
+    assert (start[ind], stop[ind], y[ind]) == (
+        t.nodes[37401]["start"],
+        t.nodes[37401]["stop"],
+        t.nodes[37401]["y"],
+    ), "Expected arrays to match node attributes of track 37401"
+
+
 def test_generating_tree_upon_selection(viewer, db_session):
     """
     Test generating a tree upon selecting a new object.
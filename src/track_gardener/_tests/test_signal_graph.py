@@ -1,10 +1,11 @@
 from unittest.mock import Mock
 
+import numpy as np
 import pyqtgraph as pg
 from qtpy.QtCore import QPointF, Qt
 
 import track_gardener.db.db_functions as fdb
-from track_gardener.graph.signal_graph import SignalGraph
+from track_gardener.graph.signal_graph import SignalGraph, signal_traces
 
 
 def test_init_signal_graph(viewer, db_session):
@@ -94,6 +95,30 @@ def test_ploting_cell(viewer, db_session):
     ), "Expected to get a query after selecting a new object."
 
 
+def test_signal_traces_with_gaps():
+    """
+    Test that missing time points and signals are filled with nan.
+    """
+    query = [
+        (3, {"sig_a": 1.0, "sig_b": 2.0}, {}),
+        (4, {"sig_a": 1.5}, {}),
+        (6, {"sig_a": 3.0, "sig_b": 4.0}, {}),
+    ]
+
+    full_x_range, y_signals = signal_traces(query, ["sig_a", "sig_b"])
+
+    assert full_x_range.tolist() == [
+        3,
+        4,
+        5,
+        6,
+    ], f"Expected time points 3 to 6, got {full_x_range.tolist()}"
+    np.testing.assert_array_equal(y_signals["sig_a"], [1.0, 1.5, np.nan, 3.0])
+    np.testing.assert_array_equal(
+        y_signals["sig_b"], [2.0, np.nan, np.nan, 4.0]
+    )
+
+
 def test_plotting_non_existent_cell(viewer, db_session):
     """
     Test plotting a non-existent cell on the signal graph.
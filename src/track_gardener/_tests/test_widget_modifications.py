@@ -1,5 +1,6 @@
 from unittest.mock import MagicMock
 
+import numpy as np
 from qtpy.QtCore import Qt
 from qtpy.QtTest import QTest
 from qtpy.QtWidgets import QDialog, QPushButton
@@ -540,6 +541,42 @@ def test_mod_cell_function_modification(viewer, db_session, mocker):
     ), f'Expected status of the viewer to be "{exp_status}", instead it is "{viewer.status}"'
 
 
+def test_mod_cell_function_shift_tolerance(viewer, db_session, mocker):
+    """
+    Test that a cell shifted by up to 2 pixels with an unchanged mask
+    is not saved again, while a larger shift is.
+    """
+
+    modification_widget = ModificationWidget(viewer, db_session)
+    viewer.dims.set_point(0, 0)
+
+    # cell with the centroid at (11.5, 11.5)
+    modification_widget.labels.data[10:14, 10:14] = 2
+
+    mock_func_db = mocker.patch(
+        "track_gardener.widget.widget_modifications.fdb.add_new_CellDB"
+    )
+    mocker.patch(
+        "track_gardener.widget.widget_modifications.fdb.remove_CellDB"
+    )
+
+    for pos, expected in [(13, False), (9, True)]:
+        mock_func_db.reset_mock()
+
+        mock_cell = MagicMock()
+        mock_cell.track_id = 2
+        mock_cell.row = pos
+        mock_cell.col = 11
+        mock_cell.mask = np.ones((4, 4), dtype=bool)
+        modification_widget.labels.metadata["query"] = [mock_cell]
+
+        modification_widget.mod_cell_function()
+
+        assert (
+            mock_func_db.called == expected
+        ), f"Stored row {pos}: expected saving to be {expected}."
+
+
 def test_tags_create_buttons(viewer, db_session, mocker):
     """
     Test creating adding tag buttons when a dictionary is provided.
@@ -1,7 +1,9 @@
 from unittest.mock import Mock
 
 import numpy as np
+from sqlalchemy import event
 
+from track_gardener.db.db_model import CellDB
 from track_gardener.widget.widget_navigation import TrackNavigationWidget
 
 
@@ -28,6 +30,25 @@ def test_select_label(qtbot, viewer, db_session):
     assert track_navigation_widget.labels.selected_label == expected_label
 
 
+def test_select_label_outside_image(qtbot, viewer, db_session):
+    """
+    Test that a right click outside of the labels keeps the selection.
+    """
+
+    track_navigation_widget = TrackNavigationWidget(viewer, db_session)
+    track_navigation_widget.labels.selected_label = 20422
+
+    pos = (10, -5.0, 10500.0)
+    viewer.cursor.position = pos
+    event = Mock()
+    event.button = 2
+    event.position = pos
+
+    track_navigation_widget.select_label(viewer, event)
+
+    assert track_navigation_widget.labels.selected_label == 20422
+
+
 def test_go_to_track_beginning(qtbot, viewer, db_session):
     """
     Test moving to the beginning of the track.
@@ -188,3 +209,90 @@ def test_build_labels_too_many(qtbot, viewer, db_session):
     assert (
         np.max(viewer.layers["Labels"].data) == 0
     ), f'Expected no labels, instead get max label {np.max(viewer.layers["Labels"].data)}'
+
+
+def test_build_labels_cached(qtbot, viewer, db_session):
+    """
+    Test that revisiting a frame does not query the database again
+    until the database changes.
+    """
+
+    track_navigation_widget = TrackNavigationWidget(viewer, db_session)
+
+    qtbot.addWidget(track_navigation_widget)
+
+    track_navigation_widget.follow_object_checkbox.setChecked(False)
+
+    queries = []
+    event.listen(
+        db_session, "do_orm_execute", lambda state: queries.append(state)
+    )
+
+    viewer.dims.set_point(0, 110)
+    viewer.dims.set_point(0, 111)
+    viewer.dims.set_point(0, 110)
+    viewer.dims.set_point(0, 111)
+
+    assert len(queries) == 2, f"Expected 2 queries, got {len(queries)}."
+
+    # a commit invalidates the cached queries
+    db_session.commit()
+    viewer.dims.set_point(0, 110)
+
+    assert len(queries) == 3, f"Expected 3 queries, got {len(queries)}."
+
+
+def test_labels_scatter():
+    """
+    Test that scattering cells gives the same labels as painting them
+    and that overlapping cells are not summed.
+    """
+    rng = np.random.default_rng(0)
+    cells = []
+    for track_id, (r, c) in enumerate([(2, 3), (20, 5), (8, 30)], start=1):
+        mask = rng.random((10, 12)) > 0.3
+        cells.append(
+            CellDB(
+                track_id=track_id,
+                t=0,
+                bbox_0=r,
+                bbox_1=c,
+                bbox_2=r + 10,
+                bbox_3=c + 12,
+                mask=mask,
+            )
+        )
+
+    shape = (40, 50)
+    expected = np.zeros(shape, dtype=int)
+    for cell in cells:
+        expected[cell.bbox_0 : cell.bbox_2, cell.bbox_1 : cell.bbox_3][
+            cell.mask
+        ] = cell.track_id
+
+    frame = np.zeros(shape, dtype=int)
+    flat_ind, track_ids = TrackNavigationWidget.labels_scatter(cells, shape[1])
+    np.put(frame, flat_ind, track_ids)
+
+    np.testing.assert_array_equal(frame, expected)
+
+    # overlapping cells - the pixel gets one of the track ids
+    overlap = CellDB(
+        track_id=7,
+        t=0,
+        bbox_0=2,
+        bbox_1=3,
+        bbox_2=12,
+        bbox_3=15,
+        mask=np.ones((10, 12), dtype=bool),
+    )
+    flat_ind, track_ids = TrackNavigationWidget.labels_scatter(
+        [cells[0], overlap], shape[1]
+    )
+    frame = np.zeros(shape, dtype=int)
+    np.put(frame, flat_ind, track_ids)
+
+    assert set(np.unique(frame[2:12, 3:15])) <= {
+        1,
+        7,
+    }, "Expected overlapping cells to be overwritten, not summed."
@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import dask.array as da
 import numpy as np
 from qtpy.QtWidgets import QPushButton
 
@@ -157,3 +158,28 @@ def test_reorg_widgets(viewer, mocker):
     assert (
         "Add graph" in push_buttons_in_settings
     ), f'Expected "Add graph" button to be in the settings window, instead buttons: {push_buttons_in_settings}'
+
+
+def test_experiment_loading_frame_chunks(viewer, mocker):
+    """
+    Test that signal data is rechunked to single frames along t
+    and keeps the storage chunking of rows and columns.
+    """
+    set_widget = SettingsWidget(viewer)
+
+    set_widget.channels_list = [{"path": "test1.zarr"}]
+    set_widget.labels_settings = {}
+
+    mock_load_zarr = mocker.patch(
+        "track_gardener.widget.widget_settings.SettingsWidget.load_zarr"
+    )
+    mock_load_zarr.return_value = [da.zeros((4, 100, 100), chunks=(2, 25, 25))]
+
+    set_widget.loadExperiment()
+
+    signal_data = set_widget.channels_data_list[0]
+    assert signal_data.chunksize == (
+        1,
+        25,
+        25,
+    ), f"Expected (1, 25, 25) chunks, got {signal_data.chunksize}"
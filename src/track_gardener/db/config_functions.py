@@ -1,16 +1,75 @@
 import importlib
 import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import lru_cache
+from pathlib import Path
 
 import numpy as np
 import yaml
-from skimage.measure import regionprops
-from skimage.measure._regionprops import COL_DTYPES, _require_intensity_image
 from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 
 import track_gardener.db.db_functions as fdb
 from track_gardener.db.db_model import CellDB
+from track_gardener.db.signal_kernels import (
+    KERNEL_FUNCTIONS,
+    masked_channel_stats,
+)
+
+# measurement sources implemented in the package - any other source
+# is a path to a custom python file
+BUILTIN_SOURCES = frozenset({"regionprops", "track_gardener"})
+
+# libyaml based loader when PyYAML is built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+def load_config(file_path):
+    """
+    Function to read the config file.
+    Parsed files are cached by their path, modification time and size,
+    so the same file is parsed once however many times it is loaded.
+    Set TRACK_GARDENER_NO_CACHE to always read from disk.
+    input:
+        file_path: path to the yaml config file
+    output:
+        config: dictionary with the content of the config file
+    """
+    if os.environ.get("TRACK_GARDENER_NO_CACHE"):
+        return _parse_config(file_path)
+
+    file_path = os.path.abspath(file_path)
+    file_stat = os.stat(file_path)
+    config = _load_config_cached(
+        file_path, file_stat.st_mtime_ns, file_stat.st_size
+    )
+
+    # callers get their own copy of the cached content
+    return deepcopy(config)
+
+
+def _parse_config(file_path):
+    """
+    Parse the yaml config file.
+    The file is read at once as bytes - libyaml decodes it itself.
+    """
+    with open(file_path, "rb") as config_file:
+        return yaml.load(config_file.read(), Loader=SafeLoader)
+
+
+@lru_cache(maxsize=16)
+def _load_config_cached(file_path, mtime_ns, size):
+    """
+    Cached parsing - mtime_ns and size are part of the key
+    so that edited files are read again.
+    """
+    return _parse_config(file_path)
 
 
 def validateConfigFile(file_path):
@@ -19,11 +78,10 @@ def validateConfigFile(file_path):
     """
 
     # load the config file
-    with open(file_path) as config_file:
-        try:
-            config = yaml.safe_load(config_file)
-        except yaml.YAMLError as exc:
-            return False, f"Error loading the config file: {exc}"
+    try:
+        config = load_config(file_path)
+    except yaml.YAMLError as exc:
+        return False, f"Error loading the config file: {exc}"
 
     # test if the database path is correct
     if "database" not in config:
@@ -42,30 +100,41 @@ def validateConfigFile(file_path):
             if "zarr" not in ch["path"]:
                 return False, "Accepting only zarr files as signal channels."
 
-    # test requested regionprops functions without signals
+    # test requested regionprops functions
     req_regionprops_no_signal = [
         x["function"]
         for x in config["cell_measurements"]
         if x["source"] == "regionprops" and "channels" not in x
     ]
-    if not all(x in COL_DTYPES for x in req_regionprops_no_signal):
-        return (
-            False,
-            "Requested regionprops functions without signals are not supported.",
-        )
-
-    # test requested regionprops functions with signals
     req_regionprops_signal = [
         x["function"]
         for x in config["cell_measurements"]
         if x["source"] == "regionprops" and "channels" in x
     ]
-    if not all(x in _require_intensity_image for x in req_regionprops_signal):
-        return (
-            False,
-            "Requested regionprops functions with signals are not supported.",
+
+    # scikit-image is imported only when regionprops are requested
+    if len(req_regionprops_no_signal) + len(req_regionprops_signal) > 0:
+        from skimage.measure._regionprops import (
+            COL_DTYPES,
+            _require_intensity_image,
         )
 
+        # without signals
+        if not all(x in COL_DTYPES for x in req_regionprops_no_signal):
+            return (
+                False,
+                "Requested regionprops functions without signals are not supported.",
+            )
+
+        # with signals
+        if not all(
+            x in _require_intensity_image for x in req_regionprops_signal
+        ):
+            return (
+                False,
+                "Requested regionprops functions with signals are not supported.",
+            )
+
     # test track_gardener functions
     req_tr_gard_functions = [
         x["function"]
@@ -80,16 +149,25 @@ def validateConfigFile(file_path):
                 f'Requested Track Gardener function "{f}" is not implemented. Use a custom function instead.',
             )
 
-    # test custom functions
-    req_custom_functions = [
-        x
-        for x in config["cell_measurements"]
-        if x["source"] != "regionprops" and x["source"] != "track_gardener"
-    ]
-    for f in req_custom_functions:
-        status, msg = load_function_from_path(f["source"], f["function"])
-        if status is False:
-            return False, msg
+    # test custom functions - every distinct script function is loaded
+    # once and different scripts are loaded in parallel
+    req_custom_functions = list(
+        dict.fromkeys(
+            (x["source"], x["function"])
+            for x in config["cell_measurements"]
+            if x["source"] not in BUILTIN_SOURCES
+        )
+    )
+    if len(req_custom_functions) > 0:
+        with ThreadPoolExecutor(
+            max_workers=min(8, len(req_custom_functions))
+        ) as executor:
+            results = executor.map(
+                lambda f: load_function_from_path(*f), req_custom_functions
+            )
+            for status, msg in results:
+                if status is False:
+                    return False, msg
 
     # test unique measurements names
     status, output = check_unique_names(config)
@@ -99,19 +177,20 @@ def validateConfigFile(file_path):
     # check that the requested signals are in the database
     engine = create_engine(f"sqlite:///{database_path}")
     session = sessionmaker(bind=engine)()
-    example_cell = session.query(CellDB).first()
-    signal_list = list(example_cell.signals.keys())
+    (signals,) = session.query(CellDB.signals).first()
+    signal_set = set(signals.keys())
     for x in output:
-        if x not in signal_list:
+        if x not in signal_set:
             return (
                 False,
                 f'Requested signal "{x}" not present in the database.',
             )
 
     # test that graphs request existing measurements
+    measurement_names = set(output)
     req_graphs = [signal for x in config["graphs"] for signal in x["signals"]]
     for g in req_graphs:
-        if g not in output:
+        if g not in measurement_names:
             return (
                 False,
                 f'Requested graph for "{g}" not present in measurements.',
@@ -123,38 +202,54 @@ def validateConfigFile(file_path):
 def test_database_connection(database_path):
     """
     Test whether the database file is executable.
+    The file is opened read-only with sqlite3 - no engine is needed.
     """
+    uri = f"{Path(database_path).absolute().as_uri()}?mode=ro"
 
     try:
-        # Create the database engine
-        engine = create_engine(f"sqlite:///{database_path}")
-        # Initialize a session
-        sessionmaker(bind=engine)()
+        con = sqlite3.connect(uri, uri=True)
+        try:
+            # reading the schema version fails for non database files
+            con.execute("PRAGMA schema_version")
+        finally:
+            con.close()
 
         return True, "Database connection successful."
-    except SQLAlchemyError as e:
+    except sqlite3.Error as e:
         return False, f"Database connection failed: {e}"
 
 
+@lru_cache(maxsize=None)
 def load_function_from_module(module_name, function_name):
+    """
+    Function to get a function from an importable module.
+    Lookups are cached - the same function object is returned every time.
+    """
     module = importlib.import_module(module_name)
     return getattr(module, function_name)
 
 
 def load_function_from_path(file_path, function_name):
-    # Check if the file exists
-    if not os.path.exists(file_path):
+    """
+    Function to get a function from a python file.
+    Files are executed once per version (modification time and size),
+    so edits to the file are picked up while repeated lookups of any
+    of its functions are cached.
+    output:
+        (True, function) or (False, error message)
+    """
+    # a single stat checks that the file exists and gives its version
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
         return False, f"File '{file_path}' does not exist."
 
-    # Load the module from the specified file path
-    module_name = os.path.splitext(os.path.basename(file_path))[
-        0
-    ]  # Extract module name from file
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    module = importlib.util.module_from_spec(spec)
     try:
-        # Execute the module to load it
-        spec.loader.exec_module(module)
+        module = _load_module_from_path_cached(
+            os.path.abspath(file_path),
+            file_stat.st_mtime_ns,
+            file_stat.st_size,
+        )
         # Get the function
         func = getattr(module, function_name)
         return True, func  # Successfully loaded function
@@ -165,31 +260,45 @@ def load_function_from_path(file_path, function_name):
         )
 
 
+@lru_cache(maxsize=None)
+def _load_module_from_path_cached(file_path, mtime_ns, size):
+    """
+    Cached loading - mtime_ns and size are part of the key
+    so that edited files are executed again.
+    """
+    # Load the module from the specified file path
+    module_name = os.path.splitext(os.path.basename(file_path))[
+        0
+    ]  # Extract module name from file
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    # Execute the module to load it
+    spec.loader.exec_module(module)
+
+    return module
+
+
 def check_unique_names(config):
     """
     Check that the names of the measurements are unique.
     """
-    req_f = list(config["cell_measurements"])
     name_list = []
-    for f in req_f:
+    for f in config["cell_measurements"]:
+        base_name = f["name"] if "name" in f else f["function"]
 
         if "channels" in f:
-            for ch in f["channels"]:
-                if "name" in f:
-                    name = ch + "_" + f["name"]
-                else:
-                    name = ch + "_" + f["function"]
-                name_list.append(name)
-
+            name_list.extend(ch + "_" + base_name for ch in f["channels"])
         else:
-            name = f["name"] if "name" in f else f["function"]
-
-            name_list.append(name)
+            name_list.append(base_name)
 
     if len(name_list) == len(set(name_list)):
         return True, name_list
-    else:
-        return False, "Measurement names are not unique."
+
+    duplicates = [name for name, n in Counter(name_list).items() if n > 1]
+    return (
+        False,
+        f"Measurement names are not unique: {', '.join(duplicates)}.",
+    )
 
 
 def create_calculate_signals_function(config):
@@ -220,6 +329,21 @@ def create_calculate_signals_function(config):
         if x["source"] == "regionprops" and "channels" in x
     ]
 
+    # statistics calculated by the kernel - in a fixed order,
+    # so the same specialised kernel is reused
+    kernel_functions = tuple(
+        f
+        for f in KERNEL_FUNCTIONS
+        if any(x["function"] == f for x in reg_signal)
+    )
+
+    # regionprops is only needed for functions not covered by the kernel
+    reg_signal_needs_regionprops = any(
+        x["function"] not in KERNEL_FUNCTIONS for x in reg_signal
+    )
+    if reg_signal_needs_regionprops:
+        from skimage.measure import regionprops
+
     # track gardener implemented functions
     gardener_signal = [
         x
@@ -227,28 +351,81 @@ def create_calculate_signals_function(config):
         if x["source"] == "track_gardener"
     ]
 
+    # ring measurements sharing the same ring are calculated together
+    ring_groups = {}
+    for m in gardener_signal:
+        if m["function"] == "ring_intensity":
+            key = (m.get("ring_width", 5), m.get("ring_shape", "disk"))
+            ring_groups.setdefault(key, []).append(m)
+    gardener_signal = [
+        x for x in gardener_signal if x["function"] != "ring_intensity"
+    ]
+
     # custom functions
     custom_signal = [
         x
         for x in config["cell_measurements"]
-        if x["source"] != "track_gardener" and x["source"] != "regionprops"
+        if x["source"] not in BUILTIN_SOURCES
     ]
 
     if (
         len(reg_no_signal) == 0
         and len(reg_signal) == 0
         and len(gardener_signal) == 0
+        and len(ring_groups) == 0
         and len(custom_signal) == 0
     ):
         return None
 
+    # output names and channel positions are fixed for the config,
+    # so they are resolved once here and not for every cell
+    def outputs(m):
+        return [
+            (ch + "_" + m["name"], ch_list.index(ch)) for ch in m["channels"]
+        ]
+
+    reg_signal_outputs = [(m["function"], outputs(m)) for m in reg_signal]
+    # functions are resolved once per distinct (source, function) pair
+    functions = {}
+    for m in gardener_signal + custom_signal:
+        key = (m["source"], m["function"])
+        if key in functions:
+            continue
+        if m["source"] == "track_gardener":
+            functions[key] = load_function_from_module(
+                "track_gardener.db.db_functions", m["function"]
+            )
+        else:
+            _, functions[key] = load_function_from_path(*key)
+
+    gardener_outputs = [
+        (functions[m["source"], m["function"]], m, outputs(m))
+        for m in gardener_signal
+    ]
+    ring_outputs = [
+        (
+            ring_width,
+            ring_shape,
+            [m.get("statistics", "mean") for m in group],
+            [outputs(m) for m in group],
+        )
+        for (ring_width, ring_shape), group in ring_groups.items()
+    ]
+    custom_outputs = [
+        (functions[m["source"], m["function"]], m, outputs(m))
+        for m in custom_signal
+    ]
+
     #######################################################################################################################
-    def calculate_cell_signals(cell, t, ch_data_list):
+    def calculate_cell_signals(cell, t, ch_data_list, window=None):
         """
         Function to calculate signals for every given cell.
         input:
             cell: cell object from regionprops
             ch_data_list: list of all channel data
+            window: region of the frame already read with
+                    fdb.read_signal_window - used by the regionprops and
+                    ring measurements, custom functions get ch_data_list
         output:
             cell_dict: dictionary containing all measurements for the cell
         """
@@ -273,52 +450,68 @@ def create_calculate_signals_function(config):
                 ),
                 dtype=ch_data_list[0].dtype,
             )
-            for ind, ch in enumerate(ch_data_list):
-                if ch.ndim == 3:
-                    cell_signal = ch[
-                        t,
-                        cell.bbox[0] : cell.bbox[2],
-                        cell.bbox[1] : cell.bbox[3],
-                    ]
-                if ch.ndim == 2:
-                    cell_signal = ch[
-                        cell.bbox[0] : cell.bbox[2],
-                        cell.bbox[1] : cell.bbox[3],
-                    ]
-
-                signal_cube[:, :, ind] = cell_signal
-
-            result = regionprops(
-                cell.image.astype(int), intensity_image=signal_cube
-            )
+            for ind in range(len(ch_data_list)):
+                signal_cube[:, :, ind] = fdb.signal_region(
+                    ch_data_list, ind, t, cell.bbox, window
+                )
+
+            # one pass over the cell pixels for the basic statistics
+            if len(kernel_functions) > 0:
+                kernel_result = masked_channel_stats(
+                    signal_cube, cell.image, kernel_functions
+                )
+            else:
+                kernel_result = {}
+
+            if reg_signal_needs_regionprops:
+                result = regionprops(
+                    cell.image.astype(int), intensity_image=signal_cube
+                )
 
-            for m in reg_signal:
-                for ch in m["channels"]:
-                    cell_dict[ch + "_" + m["name"]] = result[0][m["function"]][
-                        ch_list.index(ch)
-                    ]
+            for function, m_outputs in reg_signal_outputs:
+                if function in kernel_result:
+                    values = kernel_result[function].tolist()
+                else:
+                    values = result[0][function]
+                for name, ind in m_outputs:
+                    cell_dict[name] = values[ind]
 
         #######################################################################################################################
         # add measurements from the track gardener
         # for simplicity we calculate for all the channels - may be revisited later
-        if len(gardener_signal) > 0:
-            for m in gardener_signal:
-                f = load_function_from_module(
-                    "track_gardener.db.db_functions", m["function"]
-                )
-                result = f(cell, t, ch_data_list, kwargs=m)
-                for ch in m["channels"]:
-                    cell_dict[ch + "_" + m["name"]] = result[ch_list.index(ch)]
+        for f, m, m_outputs in gardener_outputs:
+            result = f(cell, t, ch_data_list, kwargs=m)
+            for name, ind in m_outputs:
+                cell_dict[name] = result[ind]
+
+        #######################################################################################################################
+        # add ring measurements - one pass per ring for all its statistics
+        for ring_width, ring_shape, statistics, group_outputs in ring_outputs:
+            result = fdb.ring_statistics(
+                cell,
+                t,
+                ch_data_list,
+                ring_width=ring_width,
+                ring_shape=ring_shape,
+                statistics=statistics,
+                window=window,
+            )
+            for m_outputs, values in zip(group_outputs, result):
+                for name, ind in m_outputs:
+                    cell_dict[name] = values[ind]
 
         #######################################################################################################################
         # add measurements from the custom functions
-        if len(custom_signal) > 0:
-            for m in custom_signal:
-                f = load_function_from_path(m["source"], m["function"])
-                result = f(cell, t, ch_data_list, kwargs=m)
-                for ch in m["channels"]:
-                    cell_dict[ch + "_" + m["name"]] = result[ch_list.index(ch)]
+        for f, m, m_outputs in custom_outputs:
+            result = f(cell, t, ch_data_list, kwargs=m)
+            for name, ind in m_outputs:
+                cell_dict[name] = result[ind]
 
         return cell_dict
 
+    # margin around the cells that a window has to cover for the rings
+    calculate_cell_signals.window_padding = max(
+        (ring_width for ring_width, _ in ring_groups), default=0
+    )
+
     return calculate_cell_signals
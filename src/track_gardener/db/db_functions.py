@@ -1,10 +1,8 @@
 from copy import deepcopy
 
-import dask.array as da
 import numpy as np
-from skimage.morphology import binary_dilation, disk
-from sqlalchemy import and_
-from sqlalchemy.orm import aliased
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import aliased, load_only
 from sqlalchemy.orm.attributes import flag_modified
 
 from track_gardener.db.db_model import CellDB, TrackDB
@@ -35,8 +33,9 @@ def get_signals(session):
     """
     Function to get signal names from the database.
     """
-    example_cell = session.query(CellDB).first()
-    signal_list = list(example_cell.signals.keys())
+    # only the signals column is read - the mask is not unpickled
+    (signals,) = session.query(CellDB.signals).first()
+    signal_list = list(signals.keys())
 
     return signal_list
 
@@ -88,11 +87,20 @@ def delete_trackDB(session, active_label):
 
     # if the track is found
     if record is not None:
-        # process descendants
+        # process descendants - every child becomes the root of its
+        # own family, resolved in a single pass over the family
         descendants = get_descendants(session, active_label)
-        for track in [x for x in descendants if x.track_id != active_label]:
-            if track.parent_track_id == active_label:
-                cut_trackDB(session, track.track_id, track.t_begin)
+        children = {}
+        for track in descendants:
+            children.setdefault(track.parent_track_id, []).append(track)
+
+        for child in children.get(active_label, []):
+            child.parent_track_id = -1
+            stack = [child]
+            while stack:
+                track = stack.pop()
+                track.root = child.track_id
+                stack.extend(children.get(track.track_id, []))
 
         # delete the track
         session.delete(record)
@@ -158,13 +166,18 @@ def cut_trackDB(session, active_label, current_frame):
         org_t_end = record.t_end
 
         # account for a situation when it's a gap around the cut
-        cells_t = (
-            session.query(CellDB.t).filter_by(track_id=active_label).all()
-        )
-        t_start = min(
-            [cell[0] for cell in cells_t if cell[0] >= current_frame]
+        t_start, t_stop = (
+            session.query(
+                func.min(case((CellDB.t >= current_frame, CellDB.t))),
+                func.max(case((CellDB.t < current_frame, CellDB.t))),
+            )
+            .filter(CellDB.track_id == active_label)
+            .one()
         )
-        t_stop = max([cell[0] for cell in cells_t if cell[0] < current_frame])
+        if t_start is None or t_stop is None:
+            raise ValueError(
+                f"No cells of track {active_label} around the cut."
+            )
         record.t_end = t_stop
 
         # add completely new track
@@ -359,12 +372,14 @@ def cellsDB_after_trackDB(
         current_frame - current time point
     """
 
-    # query CellDB
+    # query CellDB - only the keys are loaded, masks and signals
+    # are not needed to move or delete the cells
+    cells = session.query(CellDB).options(load_only(CellDB.t))
+
     # order by time
     if direction == "after":
         query = (
-            session.query(CellDB)
-            .filter(
+            cells.filter(
                 and_(
                     CellDB.track_id == active_label, CellDB.t >= current_frame
                 )
@@ -374,17 +389,14 @@ def cellsDB_after_trackDB(
         )
     elif direction == "before":
         query = (
-            session.query(CellDB)
-            .filter(
+            cells.filter(
                 and_(CellDB.track_id == active_label, CellDB.t < current_frame)
             )
             .order_by(CellDB.t)
             .all()
         )
     elif direction == "all":
-        query = (
-            session.query(CellDB).filter(CellDB.track_id == active_label).all()
-        )
+        query = cells.filter(CellDB.track_id == active_label).all()
     else:
         raise ValueError("Direction should be 'all', 'before' or 'after'.")
 
@@ -422,18 +434,16 @@ def trackDB_after_cellDB(session, cell_id, current_frame):
             root=cell_id,
         )
         session.add(track)
-        session.commit()
 
-    # query for cells
-    cells_t = session.query(CellDB.t).filter(CellDB.track_id == cell_id).all()
+    # query for the time span of cells
+    t_min, t_max = (
+        session.query(func.min(CellDB.t), func.max(CellDB.t))
+        .filter(CellDB.track_id == cell_id)
+        .one()
+    )
 
     # there are cells - adjust the track
-    if len(cells_t) > 0:
-
-        cells_t = [cell[0] for cell in cells_t]
-
-        t_min = min(cells_t)
-        t_max = max(cells_t)
+    if t_min is not None:
 
         if track.t_begin != t_min:
             # cell added to the left
@@ -471,6 +481,7 @@ def remove_CellDB(session, cell_id, current_frame):
 
     cell = (
         session.query(CellDB)
+        .options(load_only(CellDB.t))
         .filter(CellDB.track_id == cell_id)
         .filter(CellDB.t == current_frame)
         .first()
@@ -478,8 +489,8 @@ def remove_CellDB(session, cell_id, current_frame):
 
     if cell is not None:
 
+        # the deletion is committed together with the tracks changes
         session.delete(cell)
-        session.commit()
 
         # deal with the tracks
         trackDB_after_cellDB(session, cell_id, current_frame)
@@ -488,11 +499,12 @@ def remove_CellDB(session, cell_id, current_frame):
         print("Cell not found")
 
 
-def add_new_core_CellDB(session, current_frame, cell):
+def add_new_core_CellDB(session, current_frame, cell, commit=True):
     """
     session
     current_frame
     cell - regionprops format cell
+    commit - if False the cell is only added to the session
     """
 
     # start the object
@@ -509,7 +521,8 @@ def add_new_core_CellDB(session, current_frame, cell):
     cell_db.mask = cell.image
 
     session.add(cell_db)
-    session.commit()
+    if commit:
+        session.commit()
 
     return cell_db
 
@@ -521,15 +534,20 @@ def add_new_CellDB(
     modified=True,
     ch_list=None,
     signal_function=None,
+    signal_window=None,
 ):
     """
     Function to add a complete cell
     """
 
-    cell_db = add_new_core_CellDB(session, current_frame, cell)
+    cell_db = add_new_core_CellDB(session, current_frame, cell, commit=False)
 
     # add signals to the cell
-    if signal_function is not None:
+    if signal_function is not None and signal_window is not None:
+        new_signals = signal_function(
+            cell, current_frame, ch_list, window=signal_window
+        )
+    elif signal_function is not None:
         new_signals = signal_function(cell, current_frame, ch_list)
     else:
         new_signals = {}
@@ -541,9 +559,7 @@ def add_new_CellDB(
         tags["modified"] = True
         cell_db.tags = tags
 
-    session.commit()
-
-    # deal with the tracks
+    # deal with the tracks - the cell is committed together with them
     trackDB_after_cellDB(session, cell_db.track_id, current_frame)
 
 
@@ -587,6 +603,7 @@ def tag_cell(session, active_cell, frame, annotation):
 
     cell_list = (
         session.query(CellDB)
+        .options(load_only(CellDB.tags))
         .filter(CellDB.t == frame)
         .filter(CellDB.track_id == active_cell)
         .all()
@@ -614,26 +631,163 @@ def tag_cell(session, active_cell, frame, annotation):
     return sts
 
 
+def _sum_dtype(values):
+    """
+    Accumulator for exact sums - integer images (e.g. uint16) are summed
+    as int64 without converting every pixel to float.
+    """
+    if np.issubdtype(values.dtype, np.integer):
+        return np.int64
+    return np.float64
+
+
+def _partition_median(values):
+    """
+    Median of a 1D array with a partial sort (quickselect) instead of
+    a full sort.
+    """
+    k = values.size
+    if k == 0:
+        return np.nan
+
+    half = k // 2
+    if k % 2:
+        return np.partition(values, half)[half]
+
+    part = np.partition(values, [half - 1, half])
+    return (part[half - 1] + np.float64(part[half])) / 2
+
+
+def read_signal_window(ch_data_list, t, region):
+    """
+    Function to read a region of a single frame of all channels at once.
+    input:
+        ch_data_list: list of signals (t,row,col) or frames (row,col)
+        t: time point
+        region: (min_row, min_col, max_row, max_col) to read
+    output:
+        window: list of 2D arrays (one per channel) and the (row, col)
+                position of the region in the frame
+    """
+    min_row, min_col, max_row, max_col = region
+
+    frames = []
+    for ch in ch_data_list:
+        if ch.ndim == 3:
+            ch = ch[t]
+        frames.append(np.asarray(ch[min_row:max_row, min_col:max_col]))
+
+    return frames, (min_row, min_col)
+
+
+def signal_region(ch_data_list, ind, t, region, window=None):
+    """
+    Function to get a region of a single frame of one channel.
+    The region is taken from the window when the window covers it,
+    otherwise it is read from the channel data.
+    input:
+        ch_data_list: list of signals (t,row,col) or frames (row,col)
+        ind: index of the channel
+        t: time point
+        region: (min_row, min_col, max_row, max_col)
+        window: output of read_signal_window or None
+    output:
+        2D array with the signal of the region
+    """
+    min_row, min_col, max_row, max_col = region
+
+    if window is not None:
+        frames, (row_0, col_0) = window
+        frame = frames[ind]
+        if (
+            min_row >= row_0
+            and min_col >= col_0
+            and max_row <= row_0 + frame.shape[0]
+            and max_col <= col_0 + frame.shape[1]
+        ):
+            return frame[
+                min_row - row_0 : max_row - row_0,
+                min_col - col_0 : max_col - col_0,
+            ]
+
+    ch = ch_data_list[ind]
+    if ch.ndim == 3:
+        ch = ch[t]
+
+    return np.asarray(ch[min_row:max_row, min_col:max_col])
+
+
 def ring_intensity(cell, t, ch_data_list, kwargs):
     """
     Function to calculate ring intensity.
     input:
-        ch_data_list: list of signals (t,row,col)
+        cell: cell object from regionprops
+        t: time point
+        ch_data_list: list of signals (t,row,col) or frames (row,col)
+        kwargs: measurement settings from the config file
+            ring_width - width of the ring in pixels (default 5)
+            ring_shape - "disk" (default) dilates the cell mask,
+                         "bbox" uses the padded bounding box without the cell
+            statistics - "mean" (default), "sum" or "median"
 
     output:
         list of ring intensities for each channel
     """
-    # get the ring width
-    ring_width = kwargs.get("ring_width", 5)
+    return ring_statistics(
+        cell,
+        t,
+        ch_data_list,
+        ring_width=kwargs.get("ring_width", 5),
+        ring_shape=kwargs.get("ring_shape", "disk"),
+        statistics=[kwargs.get("statistics", "mean")],
+    )[0]
 
-    image_shape = ch_data_list[0].shape
+
+def ring_statistics(
+    cell,
+    t,
+    ch_data_list,
+    ring_width=5,
+    ring_shape="disk",
+    statistics=None,
+    window=None,
+):
+    """
+    Function to calculate several statistics of the same ring at once.
+    The ring mask is built and every channel is read only once.
+    input:
+        cell: cell object from regionprops
+        t: time point
+        ch_data_list: list of signals (t,row,col) or frames (row,col)
+        ring_width: width of the ring in pixels
+        ring_shape: "disk" or "bbox" (see ring_intensity)
+        statistics: list of "mean", "sum" or "median" (default ["mean"])
+        window: region of the frame already read with read_signal_window
+
+    output:
+        list (one per statistic) of lists of ring intensities for each channel
+    """
+    if statistics is None:
+        statistics = ["mean"]
+
+    if ring_shape not in ("disk", "bbox"):
+        raise ValueError(
+            f"Unknown ring shape '{ring_shape}'. Use 'disk' or 'bbox'."
+        )
+    for stat in statistics:
+        if stat not in ("mean", "sum", "median"):
+            raise ValueError(
+                f"Unknown statistics '{stat}'. Use 'mean', 'sum' or 'median'."
+            )
+
+    image_shape = ch_data_list[0].shape[-2:]
 
     min_row, min_col, max_row, max_col = cell.bbox
 
     min_row_padded = max(min_row - ring_width, 0)
     min_col_padded = max(min_col - ring_width, 0)
-    max_row_padded = min(max_row + ring_width, image_shape[1])
-    max_col_padded = min(max_col + ring_width, image_shape[2])
+    max_row_padded = min(max_row + ring_width, image_shape[0])
+    max_col_padded = min(max_col + ring_width, image_shape[1])
 
     # Dimensions of the padded region
     padded_rows = max_row_padded - min_row_padded
@@ -652,30 +806,63 @@ def ring_intensity(cell, t, ch_data_list, kwargs):
         mask_row_start:mask_row_end, mask_col_start:mask_col_end
     ] = cell.image
 
-    # Dilate the cell mask to create the outer boundary (ring)
-    dilated_mask = binary_dilation(
-        cell_mask_padded, footprint=disk(ring_width)
-    )
-
-    # Create the ring mask by subtracting the original mask from the dilated mask
-    ring_mask = dilated_mask & (~cell_mask_padded)
+    # for the bbox ring mean and sum are differences of two integrals
+    # (padded box minus cell) - no ring mask is needed for them
+    integral_path = ring_shape == "bbox"
+    ring_count = cell_mask_padded.size - cell.area
 
-    signal_list = []
-    # Extract the signal region corresponding to the padded bounding box
-    for signal_cube in ch_data_list:
-        signal_roi = signal_cube[
-            t, min_row_padded:max_row_padded, min_col_padded:max_col_padded
-        ]
+    if ring_shape == "bbox":
+        ring_mask = ~cell_mask_padded if "median" in statistics else None
+    else:
+        from skimage.morphology import binary_dilation, disk
 
-        # Extract the signal values within the ring
-        signal_in_ring = signal_roi[ring_mask]
+        # Dilate the cell mask to create the outer boundary (ring)
+        dilated_mask = binary_dilation(
+            cell_mask_padded, footprint=disk(ring_width)
+        )
 
-        # Compute the desired statistic (e.g., mean or sum)
-        ring_signal_mean = signal_in_ring.mean()
+        # Create the ring mask by subtracting the original mask from the dilated mask
+        ring_mask = dilated_mask & (~cell_mask_padded)
 
-        if isinstance(ring_signal_mean, da.core.Array):
-            ring_signal_mean = ring_signal_mean.compute()
+    signal_list = [[] for _ in statistics]
+    # Extract the signal region corresponding to the padded bounding box
+    padded_region = (
+        min_row_padded,
+        min_col_padded,
+        max_row_padded,
+        max_col_padded,
+    )
+    for ind in range(len(ch_data_list)):
+        signal_roi = signal_region(ch_data_list, ind, t, padded_region, window)
+
+        # quantities shared by the statistics of this channel
+        ring_sum = None
+        signal_in_ring = None
+
+        for ind, stat in enumerate(statistics):
+            if stat == "median":
+                if signal_in_ring is None:
+                    signal_in_ring = signal_roi[ring_mask]
+                ring_signal = _partition_median(signal_in_ring)
+
+            else:
+                if ring_sum is None and integral_path:
+                    acc = _sum_dtype(signal_roi)
+                    ring_sum = signal_roi.sum(dtype=acc) - signal_roi[
+                        cell_mask_padded
+                    ].sum(dtype=acc)
+                elif ring_sum is None:
+                    if signal_in_ring is None:
+                        signal_in_ring = signal_roi[ring_mask]
+                    ring_sum = signal_in_ring.sum(
+                        dtype=_sum_dtype(signal_in_ring)
+                    )
+                    ring_count = signal_in_ring.size
+
+                ring_signal = (
+                    ring_sum if stat == "sum" else ring_sum / ring_count
+                )
 
-        signal_list.append(ring_signal_mean)
+            signal_list[ind].append(float(ring_signal))
 
     return signal_list
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.ndimage import find_objects
+
+
+@dataclass
+class FrameTable:
+    """
+    Labels of a single frame stored as arrays - one row per label.
+    bbox_min/bbox_max follow the regionprops convention (min_row, min_col)
+    and (max_row, max_col), max excluded.
+    """
+
+    label_ids: np.ndarray
+    bbox_min: np.ndarray
+    bbox_max: np.ndarray
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def bbox(self, row):
+        """
+        Bounding box of a given row as a regionprops style tuple.
+        """
+        return (*self.bbox_min[row].tolist(), *self.bbox_max[row].tolist())
+
+    def mask(self, label_img, row):
+        """
+        Boolean mask of a given row cropped to its bounding box.
+        """
+        (r0, c0), (r1, c1) = self.bbox_min[row], self.bbox_max[row]
+        return label_img[r0:r1, c0:c1] == self.label_ids[row]
+
+    def centroid(self, mask, row):
+        """
+        Centroid (row, col) of a given row from its cropped mask.
+        """
+        rr, cc = np.nonzero(mask)
+        r0, c0 = self.bbox_min[row].tolist()
+        return r0 + rr.mean(), c0 + cc.mean()
+
+
+def build_frame_table(label_img):
+    """
+    Function to build a table of labels present in a frame.
+    input:
+        label_img: 2D labeled image
+    output:
+        FrameTable with label ids and bounding boxes
+    """
+    slices = find_objects(label_img)
+    present = [ind for ind, sl in enumerate(slices) if sl is not None]
+
+    bbox = np.array(
+        [
+            [sl[0].start, sl[1].start, sl[0].stop, sl[1].stop]
+            for sl in (slices[ind] for ind in present)
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+
+    return FrameTable(
+        label_ids=np.array(present, dtype=np.int64) + 1,
+        bbox_min=bbox[:, :2],
+        bbox_max=bbox[:, 2:],
+    )
@@ -0,0 +1,146 @@
+from functools import lru_cache
+
+import numpy as np
+
+# regionprops intensity functions that are computed directly by the kernel
+KERNEL_FUNCTIONS = (
+    "intensity_mean",
+    "intensity_min",
+    "intensity_max",
+    "intensity_std",
+)
+
+
+def _masked_channel_stats_numpy(signal_cube, mask):
+    """
+    NumPy version of the masked reduction.
+    input:
+        signal_cube: (row, col, channel) signal of the cell bounding box
+        mask: (row, col) boolean mask of the cell
+    output:
+        stats: (4, channel) array with mean, min, max and std
+    """
+    pixels = signal_cube[mask].astype(np.float64)
+
+    return np.stack(
+        [
+            pixels.mean(axis=0),
+            pixels.min(axis=0),
+            pixels.max(axis=0),
+            pixels.std(axis=0),
+        ]
+    )
+
+
+def _make_stats_loop(need_extrema, need_std):
+    """
+    Build the loop over the cell pixels for a given set of statistics.
+    The flags are closure constants, so numba removes the branches
+    that are not needed.
+    """
+
+    def _stats_loop(signal_cube, mask):
+        """
+        Loop over the cell pixels for all channels at once - a first
+        pass for sum, min and max and a second pass for the variance
+        around the mean (same as np.std). Compiled with numba when
+        it is available.
+        """
+        rows, cols, n_ch = signal_cube.shape
+        stats = np.zeros((4, n_ch), dtype=np.float64)
+        count = 0
+
+        for ch in range(n_ch):
+            stats[1, ch] = np.inf
+            stats[2, ch] = -np.inf
+
+        for r in range(rows):
+            for c in range(cols):
+                if mask[r, c]:
+                    count += 1
+                    for ch in range(n_ch):
+                        v = np.float64(signal_cube[r, c, ch])
+                        stats[0, ch] += v
+                        if need_extrema:
+                            stats[1, ch] = min(stats[1, ch], v)
+                            stats[2, ch] = max(stats[2, ch], v)
+
+        for ch in range(n_ch):
+            stats[0, ch] = stats[0, ch] / count
+
+        if need_std:
+            for r in range(rows):
+                for c in range(cols):
+                    if mask[r, c]:
+                        for ch in range(n_ch):
+                            d = (
+                                np.float64(signal_cube[r, c, ch])
+                                - stats[0, ch]
+                            )
+                            stats[3, ch] += d * d
+
+            for ch in range(n_ch):
+                stats[3, ch] = np.sqrt(stats[3, ch] / count)
+
+        return stats
+
+    return _stats_loop
+
+
+_masked_channel_stats_loop = _make_stats_loop(True, True)
+
+
+@lru_cache(maxsize=None)
+def stats_kernel(functions=KERNEL_FUNCTIONS):
+    """
+    Function to get a compiled kernel specialised for the requested
+    statistics. Kernels are cached, so every set of statistics is
+    compiled once per session. They are not cached on disk - all the
+    closures share one qualname and numba mixes up their cache entries.
+    input:
+        functions: tuple of names from KERNEL_FUNCTIONS
+    output:
+        compiled kernel or None if numba is not available
+    """
+    # numba is imported only when a kernel is needed - it is slow to import
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+
+    need_extrema = any(
+        f in functions for f in ("intensity_min", "intensity_max")
+    )
+    need_std = "intensity_std" in functions
+
+    return njit(nogil=True)(_make_stats_loop(need_extrema, need_std))
+
+
+def masked_channel_stats(signal_cube, mask, functions=KERNEL_FUNCTIONS):
+    """
+    Function to calculate intensity statistics of a cell for all channels.
+    input:
+        signal_cube: (row, col, channel) signal of the cell bounding box
+        mask: (row, col) boolean mask of the cell
+        functions: tuple of statistics to calculate (from KERNEL_FUNCTIONS)
+    output:
+        dictionary {regionprops function name: array of values per channel},
+        min and max in the dtype of signal_cube, other statistics in float64
+    """
+    kernel = stats_kernel(tuple(functions))
+
+    if kernel is not None:
+        stats = kernel(
+            np.ascontiguousarray(signal_cube), np.ascontiguousarray(mask)
+        )
+    else:
+        stats = _masked_channel_stats_numpy(signal_cube, mask)
+
+    result = {f: stats[KERNEL_FUNCTIONS.index(f)] for f in functions}
+
+    # min and max are values of the image - kept in its dtype
+    for f in ("intensity_min", "intensity_max"):
+        if f in result:
+            result[f] = result[f].astype(signal_cube.dtype)
+
+    return result
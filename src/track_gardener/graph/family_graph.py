@@ -1,6 +1,5 @@
 import networkx as nx
 import numpy as np
-import pandas as pd
 from pyqtgraph import (
     GraphicsLayoutWidget,
     TextItem,
@@ -8,6 +7,7 @@ from pyqtgraph import (
     mkPen,
 )
 from qtpy.QtCore import Qt
+from sqlalchemy import select
 
 from track_gardener.db.db_model import TrackDB
 
@@ -62,27 +62,21 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
 
             ############################################################
             # find which track was selected
-            dist = float("inf")
             selected_n = None
 
             if self.tree is not None:  # self.tree is the NetworkX graph
-                for n in self.tree.nodes():
-                    # Get node data (attributes)
-                    node_data = self.tree.nodes[n]
-
-                    # Extract node attributes (e.g., start, stop, and y values)
-                    start = node_data.get("start")
-                    stop = node_data.get("stop")
-                    y_val_node = node_data.get("y")
-
-                    # Check if the x_val falls within the start-stop range of the node
-                    if (start <= x_val) and (stop >= x_val):
-                        dist_track = abs(y_val_node - y_val)
-
-                        # Update the selected node if this node is closer to the clicked point
-                        if dist_track < dist:
-                            dist = dist_track
-                            selected_n = n
+                track_ids, start, stop, y_nodes = self._track_spans
+
+                # tracks that span the clicked time point
+                dist_track = np.where(
+                    (start <= x_val) & (stop >= x_val),
+                    np.abs(y_nodes - y_val),
+                    np.inf,
+                )
+
+                # the closest one (the first one in case of a tie)
+                if np.isfinite(dist_track.min()):
+                    selected_n = int(track_ids[np.argmin(dist_track)])
             ############################################################
 
             if event.button() == Qt.LeftButton:
@@ -164,6 +158,7 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
 
             # buid the tree
             self.tree = build_Newick_tree(self.session, root)
+            self._track_spans = tree_arrays(self.tree)
 
             # update the widget with the tree
             self.render_tree_view(self.tree)
@@ -178,13 +173,14 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
 
         G: NetworkX graph with node positions stored in 'pos' attributes.
         """
-        y_max = -0.1
-        y_min = 0.1
+        # vertical positions of all nodes - looked up once
+        y_nodes = nx.get_node_attributes(G, "y")
+        y_max = max(-0.1, *y_nodes.values())
+        y_min = min(0.1, *y_nodes.values())
 
         # Iterate over nodes in the graph
-        for node in G.nodes():
+        for node, node_data in G.nodes(data=True):
 
-            node_data = G.nodes[node]
             node_name = node_data["name"]
 
             # Get position in time (x-coordinates: start and stop)
@@ -194,8 +190,6 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
 
             # Get y-coordinate from the node's 'pos' attribute
             y_signal = np.array([node_data["y"]]).repeat(2)
-            y_max = np.max([y_signal[0], y_max])
-            y_min = np.min([y_signal[0], y_min])
 
             # Get color based on the label
             label_color = self.labels.get_color(node_name)
@@ -228,11 +222,10 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
 
             # Plot vertical lines to children
             for child in G.successors(node):
-                child_data = G.nodes[child]
 
                 # Get vertical line (constant x and different y values)
                 x_signal = [x2, x2]
-                y_signal = [node_data["y"], child_data["y"]]
+                y_signal = [node_data["y"], y_nodes[child]]
                 self.plot_view.plot(x_signal, y_signal, pen=pen)
 
         # Set plot axis limits
@@ -242,9 +235,30 @@ class FamilyGraphWidget(GraphicsLayoutWidget):
         )
 
 
+def tree_arrays(G):
+    """
+    Function to get node attributes needed for selection as arrays.
+
+    G - NetworkX graph built by build_Newick_tree
+
+    Returns:
+        track_ids, start, stop, y - arrays with one value per node
+    """
+    nodes = G.nodes(data=True)
+
+    track_ids = np.fromiter(G.nodes, dtype=np.int64, count=len(G))
+    start = np.fromiter((d["start"] for _, d in nodes), float, len(G))
+    stop = np.fromiter((d["stop"] for _, d in nodes), float, len(G))
+    y = np.fromiter((d["y"] for _, d in nodes), float, len(G))
+
+    return track_ids, start, stop, y
+
+
 def reingold_tilford(tree, node=None, depth=0, x_offset=0, x_spacing=1):
     """
-    Recursive function to apply Reingold-Tilford algorithm for binary trees.
+    Function to apply Reingold-Tilford algorithm for binary trees.
+    The tree is traversed with explicit stacks, so deep lineages
+    do not hit the recursion limit.
 
     Args:
         tree: NetworkX DiGraph representing the tree.
@@ -260,71 +274,80 @@ def reingold_tilford(tree, node=None, depth=0, x_offset=0, x_spacing=1):
     if node is None:
         node = next(n for n in tree.nodes() if tree.in_degree(n) == 0)
 
-    if tree.out_degree(node) == 0:  # If leaf node
-        return {node: (x_offset, -depth)}
-
-    children = list(tree.successors(node))
-
-    # Get positions of left and right subtrees
-    pos_left = (
-        reingold_tilford(tree, children[0], depth + 1, x_offset, x_spacing)
-        if len(children) > 0
-        else {}
-    )
-    pos_right = (
-        reingold_tilford(
-            tree,
-            children[1],
-            depth + 1,
-            x_offset + len(pos_left) * x_spacing,
-            x_spacing,
-        )
-        if len(children) > 1
-        else {}
-    )
-
-    # Calculate the center x position of the current node
-    num_left = len(pos_left)
-    num_right = len(pos_right)
-
-    # Center node between left and right children
-    x_center = x_offset + (num_left + num_right - 1) / 2.0 * x_spacing
-    pos = {node: (x_center, -depth)}
+    # only the first two children of every node are laid out
+    children = {}
+    order = []
+    stack = [(node, depth)]
+    while stack:
+        n, d = stack.pop()
+        order.append((n, d))
+        children[n] = list(tree.successors(n))[:2]
+        stack.extend((child, d + 1) for child in reversed(children[n]))
+
+    # number of laid out nodes in every subtree - children before parents
+    size = {}
+    for n, _ in reversed(order):
+        size[n] = 1 + sum(size[child] for child in children[n])
+
+    # positions - parents before children
+    offset = {node: x_offset}
+    pos = {}
+    for n, d in order:
+        if len(children[n]) == 0:  # If leaf node
+            pos[n] = (offset[n], -d)
+        else:
+            # Center node between left and right children
+            pos[n] = (offset[n] + (size[n] - 2) / 2.0 * x_spacing, -d)
 
-    # Merge positions of subtrees
-    pos.update(pos_left)
-    pos.update(pos_right)
+        child_offset = offset[n]
+        for child in children[n]:
+            offset[child] = child_offset
+            child_offset += size[child] * x_spacing
 
     return pos
 
 
-def _add_children(G, parent, df, n=2):
+def _family_nodes(root_id, children, tracks):
     """
-    Recursively adds children to the NetworkX graph from a dataframe.
+    Function to list nodes and edges of a family in depth-first order.
 
-    G - NetworkX graph
-    parent - parent node ID
-    df - dataframe with information about children
-    n - counter for numbering nodes
+    root_id - ID of the root node
+    children - dictionary {parent node ID: list of children IDs}
+    tracks - dictionary {node ID: (t_begin, t_end, accepted_tag)}
+
+    Returns:
+        nodes: list of (node ID, attributes) tuples
+        edges: list of (parent ID, child ID) tuples
     """
-    children = df[df["parent_track_id"] == parent]
-
-    for _, row in children.iterrows():
-        child_id = row["track_id"]
-        G.add_node(
-            child_id,
-            name=row["track_id"],
-            start=row["t_begin"],
-            stop=row["t_end"],
-            accepted=row["accepted_tag"],
-            num=n,
+    nodes = []
+    edges = []
+
+    stack = [(root_id, None)]
+    while stack:
+        node_id, parent = stack.pop()
+        t_begin, t_end, accepted = tracks[node_id]
+        nodes.append(
+            (
+                node_id,
+                {
+                    "name": node_id,
+                    "start": t_begin,
+                    "stop": t_end,
+                    "accepted": bool(accepted),
+                    "num": len(nodes) + 1,
+                },
+            )
         )
-        G.add_edge(parent, child_id)
+        if parent is not None:
+            edges.append((parent, node_id))
 
-        n += 1
-        n = _add_children(G, child_id, df, n)
+        # reversed so that the first child is visited first
+        stack.extend(
+            (child_id, node_id)
+            for child_id in reversed(children.get(node_id, []))
+        )
 
-    return n
+    return nodes, edges
 
 
 def build_Newick_tree(session, root_id):
@@ -334,29 +357,32 @@ def build_Newick_tree(session, root_id):
     session - database session
     root_id - ID of the root node
     """
-    # Get info about the family from the database
-    query = session.query(TrackDB).filter(TrackDB.root == root_id)
-    df = pd.read_sql(query.statement, session.bind)
+    # Get info about the family from the database - a single select
+    # of the needed columns, without building ORM objects
+    rows = session.execute(
+        select(
+            TrackDB.track_id,
+            TrackDB.parent_track_id,
+            TrackDB.t_begin,
+            TrackDB.t_end,
+            TrackDB.accepted_tag,
+        ).where(TrackDB.root == root_id)
+    ).all()
+
+    tracks = {}
+    children = {}
+    for track_id, parent_track_id, t_begin, t_end, accepted in rows:
+        tracks[track_id] = (t_begin, t_end, accepted)
+        children.setdefault(parent_track_id, []).append(track_id)
 
     # Ensure the root exists
-    assert len(df) > 0, "No data for this root_id"
+    assert root_id in tracks, "No data for this root_id"
 
-    # Create a NetworkX graph
+    # Create a NetworkX graph - all nodes and edges are added at once
+    nodes, edges = _family_nodes(root_id, children, tracks)
     G = nx.DiGraph()
-
-    # Add the root (trunk) node
-    trunk_row = df[df["track_id"] == root_id]
-    G.add_node(
-        root_id,
-        name=root_id,
-        start=trunk_row["t_begin"].values[0],
-        stop=trunk_row["t_end"].values[0],
-        accepted=bool(trunk_row["accepted_tag"].values[0]),
-        num=1,
-    )
-
-    # Recursively add children
-    _add_children(G, root_id, df)
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
 
     # add rendering
     pos = reingold_tilford(G)
@@ -160,18 +160,9 @@ class SignalGraph(GraphicsLayoutWidget):
             self.plot_view.removeItem(item)
 
         if len(self.query) > 0:
-            x_signal = [x[0] for x in self.query]
-            full_x_range = list(range(min(x_signal), max(x_signal) + 1))
-
-            y_signals = {
-                sig: [np.nan] * len(full_x_range) for sig in self.signal_list
-            }
-
-            for t, signals, _ in self.query:
-                index = full_x_range.index(t)
-                for sig in self.signal_list:
-                    if sig in signals:
-                        y_signals[sig][index] = signals[sig]
+            full_x_range, y_signals = signal_traces(
+                self.query, self.signal_list
+            )
 
             # reset view
             self.plot_view.enableAutoRange(
@@ -220,3 +211,27 @@ class SignalGraph(GraphicsLayoutWidget):
             self.get_db_info()
             self.redraw_signals()
             self.redraw_tags()
+
+
+def signal_traces(query, signal_list):
+    """
+    Function to arrange signals of a track on a continuous time axis.
+    input:
+        query: list of (t, signals, tags) rows of a track
+        signal_list: list of signal names
+    output:
+        full_x_range: array of all time points from the first to the last
+        y_signals: dictionary {signal: array of values, nan in gaps}
+    """
+    t = np.fromiter((row[0] for row in query), dtype=np.int64)
+    full_x_range = np.arange(t.min(), t.max() + 1)
+    index = t - full_x_range[0]
+
+    y_signals = {}
+    for sig in signal_list:
+        y_signals[sig] = np.full(len(full_x_range), np.nan)
+        y_signals[sig][index] = np.array(
+            [row[1].get(sig, np.nan) for row in query], dtype=np.float64
+        )
+
+    return full_x_range, y_signals
@@ -82,6 +82,9 @@ class TrackGardener(QWidget):
                 self.navigation_widget.build_labels
             )
 
+            # stop following the database changes
+            self.navigation_widget.disconnect_query_cache()
+
         # remove widgets from tab2
         if self.navigation_widget is not None:
             self.navigation_widget.setParent(None)
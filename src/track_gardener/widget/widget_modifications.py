@@ -18,6 +18,7 @@ from qtpy.QtWidgets import (
 from skimage.measure import regionprops
 
 import track_gardener.db.db_functions as fdb
+from track_gardener.db.frame_table import build_frame_table
 
 
 class ModificationWidget(QWidget):
@@ -651,69 +652,84 @@ class ModificationWidget(QWidget):
 
         # get query
         query = self.labels.metadata["query"]
-        query_ids = [cell.track_id for cell in query]
+        query_cells = {cell.track_id: cell for cell in query}
 
-        # get properties of objects in the fov
-        regionprops_results = regionprops(self.labels.data)
+        # get a table of objects in the fov
+        label_img = self.labels.data
+        frame_table = build_frame_table(label_img)
 
-        for cell_label in regionprops_results:
+        # regionprops objects are only needed for cells that are saved
+        regionprops_results = None
+        changed_cells = []
 
-            cell_label_id = cell_label.label
+        for row, cell_label_id in enumerate(frame_table.label_ids.tolist()):
 
-            if cell_label_id in query_ids:
+            cell_query = query_cells.pop(cell_label_id, None)
 
-                # remove from the query list
-                query_ids.remove(cell_label_id)
+            if cell_query is not None:
 
-                # get the cell
-                cell_query = next(
-                    x for x in query if x.track_id == cell_label_id
-                )
-
-                # if modified
-                row_diff = abs(cell_label.centroid[1] - cell_query.col) > 2
-                col_diff = abs(cell_label.centroid[0] - cell_query.row) > 2
-                mask_diff = not np.array_equal(
-                    cell_label.image, cell_query.mask
-                )
+                # if modified - shifts of up to 2 pixels are tolerated
+                mask = frame_table.mask(label_img, row)
+                centroid = frame_table.centroid(mask, row)
+                row_diff = abs(centroid[0] - cell_query.row) > 2
+                col_diff = abs(centroid[1] - cell_query.col) > 2
+                mask_diff = not np.array_equal(mask, cell_query.mask)
                 if row_diff or col_diff or mask_diff:
+                    changed_cells.append((row, cell_label_id, True))
 
-                    # update the database
-                    self.viewer.status = f"{cell_label_id} has been modified"
+            else:
+                # a new cell
+                changed_cells.append((row, cell_label_id, False))
+
+        # read the region of all saved cells once for the built-in
+        # measurements - custom functions still get the channel data
+        signal_window = None
+        padding = getattr(self.signal_function, "window_padding", None)
+        if changed_cells and self.ch_list is not None and padding is not None:
+            rows = [row for row, _, _ in changed_cells]
+            region_min = frame_table.bbox_min[rows].min(axis=0) - padding
+            region_max = frame_table.bbox_max[rows].max(axis=0) + padding
+            region = (
+                *np.maximum(region_min, 0).tolist(),
+                *np.minimum(region_max, self.ch_list[0].shape[-2:]).tolist(),
+            )
+            signal_window = fdb.read_signal_window(
+                self.ch_list, current_frame, region
+            )
 
-                    # remove old from the database
-                    fdb.remove_CellDB(
-                        self.session, cell_label_id, current_frame
-                    )
+        for _, cell_label_id, modified in changed_cells:
 
-                    # add new to the database
-                    fdb.add_new_CellDB(
-                        self.session,
-                        current_frame,
-                        cell_label,
-                        ch_list=self.ch_list,
-                        signal_function=self.signal_function,
-                    )
+            if regionprops_results is None:
+                regionprops_results = {
+                    cell.label: cell for cell in regionprops(label_img)
+                }
+            cell_label = regionprops_results[cell_label_id]
 
-                    refresh_status = True
+            if modified:
 
-            else:
+                # update the database
+                self.viewer.status = f"{cell_label_id} has been modified"
 
-                # a new cell
+                # remove old from the database
+                fdb.remove_CellDB(self.session, cell_label_id, current_frame)
+
+            else:
                 self.viewer.status = f"{cell_label_id} has been added"
-                # add new to the database
-                fdb.add_new_CellDB(
-                    self.session,
-                    current_frame,
-                    cell_label,
-                    ch_list=self.ch_list,
-                    signal_function=self.signal_function,
-                )
 
-                refresh_status = True
+            # add new to the database
+            fdb.add_new_CellDB(
+                self.session,
+                current_frame,
+                cell_label,
+                ch_list=self.ch_list,
+                signal_function=self.signal_function,
+                signal_window=signal_window,
+            )
+
+            refresh_status = True
 
         # for cells in query that are no longer in the field
-        for cell_id in query_ids:
+        for cell_id in query_cells:
 
             # cell is missing
             self.viewer.status = f"{cell_id} has been removed"
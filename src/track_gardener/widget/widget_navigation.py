@@ -1,3 +1,6 @@
+from collections import OrderedDict
+
+import numpy as np
 from qtpy.QtWidgets import (
     QCheckBox,
     QGridLayout,
@@ -7,7 +10,7 @@ from qtpy.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from sqlalchemy import and_
+from sqlalchemy import and_, event, select
 
 from track_gardener.db.db_model import CellDB, TrackDB
 
@@ -22,6 +25,12 @@ class TrackNavigationWidget(QWidget):
         self.session = sql_session
         self.query_lim = 500
 
+        # cache of recent labels queries - cleared when the db changes
+        self.query_cache = OrderedDict()
+        self.query_cache_size = 64
+        event.listen(self.session, "after_commit", self.clear_query_cache)
+        event.listen(self.session, "after_rollback", self.clear_query_cache)
+
         # add shortcuts
         self.init_shortcuts()
 
@@ -73,9 +82,16 @@ class TrackNavigationWidget(QWidget):
 
             # look up cursor position
             position = tuple([int(x) for x in self.viewer.cursor.position])
+            row, col = position[1], position[2]
 
-            # check which cell was clicked
-            myTrackNum = self.labels.data[position[1], position[2]]
+            # ignore clicks outside of the labels
+            rows, cols = self.labels.data.shape[-2:]
+            if not (0 <= row < rows and 0 <= col < cols):
+                return
+
+            # check which cell was clicked - only the pixel under the cursor
+            # is read (works for numpy and dask backed labels)
+            myTrackNum = np.asarray(self.labels.data[row, col])
 
             # set track as active
             self.labels.selected_label = int(myTrackNum)
@@ -114,24 +130,23 @@ class TrackNavigationWidget(QWidget):
             c_stop = c + c_rad
 
             # query the database
-            query = (
-                self.session.query(CellDB)
-                .filter(CellDB.t == current_frame)
-                .filter(CellDB.bbox_0 < int(r_stop))
-                .filter(CellDB.bbox_1 < int(c_stop))
-                .filter(CellDB.bbox_2 > int(r_start))
-                .filter(CellDB.bbox_3 > int(c_start))
-                .limit(self.query_lim)
-                .all()
+            query = self.fetch_cells(
+                current_frame,
+                int(r_start),
+                int(r_stop),
+                int(c_start),
+                int(c_stop),
             )
 
             if len(query) < self.query_lim:
                 frame = self.viewer.layers["Labels"].data
 
-                for cell in query:
-                    frame[
-                        cell.bbox_0 : cell.bbox_2, cell.bbox_1 : cell.bbox_3
-                    ] += (cell.mask.astype(int) * cell.track_id)
+                if len(query) > 0:
+                    # paint all cells with a single scatter
+                    flat_ind, track_ids = self.labels_scatter(
+                        query, frame.shape[-1]
+                    )
+                    np.put(frame, flat_ind, track_ids)
 
                 self.viewer.layers["Labels"].data = frame
                 self.viewer.status = f"Found {len(query)} cells in the field."
@@ -143,6 +158,73 @@ class TrackNavigationWidget(QWidget):
                 self.viewer.layers["Labels"].refresh()
                 self.viewer.status = f"More than {self.query_lim} in the field - zoom in to display labels."
 
+    @staticmethod
+    def labels_scatter(cells, width):
+        """
+        Function to get flat pixel indices and track ids of cells.
+        input:
+            cells: list of CellDB objects
+            width: number of columns of the labels frame
+        output:
+            flat_ind: flat indices of all cells pixels
+            track_ids: track id for every index
+        """
+        flat_ind = []
+        sizes = []
+        for cell in cells:
+            rr, cc = np.nonzero(cell.mask)
+            flat_ind.append((rr + cell.bbox_0) * width + cc + cell.bbox_1)
+            sizes.append(len(rr))
+
+        track_ids = np.repeat([cell.track_id for cell in cells], sizes)
+
+        return np.concatenate(flat_ind), track_ids
+
+    def fetch_cells(self, current_frame, r_start, r_stop, c_start, c_stop):
+        """
+        Function to get cells of a frame within the field of view.
+        Results of recent queries are kept so that going back and forth
+        in time does not query the database again.
+        """
+        key = (current_frame, r_start, r_stop, c_start, c_stop, self.query_lim)
+
+        if key in self.query_cache:
+            self.query_cache.move_to_end(key)
+            return self.query_cache[key]
+
+        query = (
+            self.session.query(CellDB)
+            .filter(CellDB.t == current_frame)
+            .filter(CellDB.bbox_0 < r_stop)
+            .filter(CellDB.bbox_1 < c_stop)
+            .filter(CellDB.bbox_2 > r_start)
+            .filter(CellDB.bbox_3 > c_start)
+            .limit(self.query_lim)
+            .all()
+        )
+
+        self.query_cache[key] = query
+        if len(self.query_cache) > self.query_cache_size:
+            self.query_cache.popitem(last=False)
+
+        return query
+
+    def clear_query_cache(self, session=None):
+        """
+        Forget cached queries - called after every commit or rollback.
+        """
+        self.query_cache.clear()
+
+    def disconnect_query_cache(self):
+        """
+        Stop listening to the session events.
+        """
+        for identifier in ["after_commit", "after_rollback"]:
+            if event.contains(
+                self.session, identifier, self.clear_query_cache
+            ):
+                event.remove(self.session, identifier, self.clear_query_cache)
+
     #########################################################
     # track navigation
     #########################################################
@@ -185,19 +267,17 @@ class TrackNavigationWidget(QWidget):
         )  # because numpy.int64 is not accepted by the database
         current_frame = self.viewer.dims.current_step[0]
 
-        # find the object
-        cell = (
-            self.session.query(CellDB)
-            .filter(
+        # find the object - only its position is read, so the mask
+        # is not unpickled and no ORM object is built
+        cell = self.session.execute(
+            select(CellDB.row, CellDB.col).where(
                 and_(CellDB.track_id == track_id, CellDB.t == current_frame)
             )
-            .first()
-        )
+        ).first()
 
         if cell is not None:
             # get the position
-            r = cell.row
-            c = cell.col
+            r, c = cell
 
             # check if there is movement
             _, x, y = self.viewer.camera.center
@@ -228,9 +308,11 @@ class TrackNavigationWidget(QWidget):
             curr_fr = self.viewer.dims.current_step[0]
 
             # find the pathway
-            tr = (
-                self.session.query(TrackDB).filter_by(track_id=curr_tr).first()
-            )
+            tr = self.session.execute(
+                select(TrackDB.t_begin, TrackDB.t_end).where(
+                    TrackDB.track_id == curr_tr
+                )
+            ).first()
 
             # move time point if beyond boundary
             if tr.t_begin > curr_fr:
@@ -260,10 +342,10 @@ class TrackNavigationWidget(QWidget):
         Go to the beginning of the track.
         """
         # find the beginning of a track
-        tr = self.labels.selected_label
-        t_begin = (
-            self.session.query(TrackDB).filter_by(track_id=tr).first().t_begin
-        )
+        tr = int(self.labels.selected_label)
+        t_begin = self.session.execute(
+            select(TrackDB.t_begin).where(TrackDB.track_id == tr)
+        ).scalar()
 
         # move to the beginning of a track
         self.viewer.dims.set_point(0, t_begin)
@@ -286,10 +368,10 @@ class TrackNavigationWidget(QWidget):
         Go to the last point in the track
         """
         # find the beginning of a track
-        tr = self.labels.selected_label
-        t_end = (
-            self.session.query(TrackDB).filter_by(track_id=tr).first().t_end
-        )
+        tr = int(self.labels.selected_label)
+        t_end = self.session.execute(
+            select(TrackDB.t_end).where(TrackDB.track_id == tr)
+        ).scalar()
 
         # move to the end of a track
         self.viewer.dims.set_point(0, t_end)
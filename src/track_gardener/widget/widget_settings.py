@@ -3,7 +3,6 @@ from pathlib import Path
 import dask.array as da
 import napari
 import numpy as np
-import yaml
 import zarr
 from qtpy import QtWidgets
 from qtpy.QtCore import Qt
@@ -23,6 +22,7 @@ from sqlalchemy.orm import sessionmaker
 import track_gardener.db.db_functions as fdb
 from track_gardener.db.config_functions import (
     create_calculate_signals_function,
+    load_config,
     validateConfigFile,
 )
 from track_gardener.widget.signal_graph_widget import CellGraphWidget
@@ -163,23 +163,20 @@ class SettingsWidget(QWidget):
         Put the content of the yaml file into internal variables.
         """
 
-        with open(filePath) as file:
-            config = yaml.safe_load(file)
+        config = load_config(filePath)
 
-            exp_settings = config.get("experiment_settings", {})
-            self.experiment_name = exp_settings.get(
-                "experiment_name", "Unnamed"
-            )
-            self.experiment_description = exp_settings.get(
-                "experiment_description", ""
-            )
-            self.database_path = config.get("database", {}).get("path", "")
-            self.channels_list = config.get("signal_channels", [])
-            self.labels_settings = config.get("labels_settings", {})
-            self.graphs_list = config.get("graphs", [])
-            self.cell_tags = config.get("cell_tags", [])
+        exp_settings = config.get("experiment_settings", {})
+        self.experiment_name = exp_settings.get("experiment_name", "Unnamed")
+        self.experiment_description = exp_settings.get(
+            "experiment_description", ""
+        )
+        self.database_path = config.get("database", {}).get("path", "")
+        self.channels_list = config.get("signal_channels", [])
+        self.labels_settings = config.get("labels_settings", {})
+        self.graphs_list = config.get("graphs", [])
+        self.cell_tags = config.get("cell_tags", [])
 
-            self.signal_function = create_calculate_signals_function(config)
+        self.signal_function = create_calculate_signals_function(config)
 
     def load_zarr(self, channel_path):
         """
@@ -192,15 +189,27 @@ class SettingsWidget(QWidget):
 
         except zarr.errors.ContainsGroupError:
 
-            # check number of levels
+            # check number of levels - the group is opened once
+            # and the levels are wrapped lazily, nothing is read here
             root_group = zarr.open_group(channel_path, mode="r")
             levels_list = [key for key in root_group if key.isdigit()]
             data = []
             for level in levels_list:
-                data.append(da.from_zarr(channel_path, level))
+                data.append(da.from_zarr(root_group[level]))
 
         return data
 
+    def frame_chunks(self, data):
+        """
+        Rechunk signal data to a single frame per chunk along t.
+        Rows and columns keep the storage chunking, so reading
+        the bounding box of a cell loads only the chunks it overlaps.
+        Layers displayed in the viewer keep the storage chunking.
+        """
+        data = da.asarray(data)
+
+        return data.rechunk({0: 1})
+
     def loadExperiment(self):
         """
         loads napari layers
@@ -232,7 +241,7 @@ class SettingsWidget(QWidget):
 
             # necessary to send to the modification widget
             # to recalculate signals when object changes
-            self.channels_data_list.append(data[0])
+            self.channels_data_list.append(self.frame_chunks(data[0]))
 
             # because napari cannot accept a single array within a list
             data_viewer = data[0] if len(data) == 1 else data
@@ -266,8 +275,10 @@ class SettingsWidget(QWidget):
         """
 
         # establish connection to the database
+        # all changes go through this session, so loaded objects
+        # are kept valid after a commit instead of being reloaded
         engine = create_engine(f"sqlite:///{self.database_path}")
-        self.session = sessionmaker(bind=engine)()
+        self.session = sessionmaker(bind=engine, expire_on_commit=False)()
 
         # get a list of signals
         self.signal_list = fdb.get_signals(self.session)